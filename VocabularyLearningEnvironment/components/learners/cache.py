@@ -0,0 +1,226 @@
+import logging
+import threading
+import time as _time
+from collections import OrderedDict
+from typing import Optional
+
+from components.teacher.items import TeachingItem, WordItem
+from .exp_memory import ExpMemoryLearner, MemoryState
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    def __init__(self, user, learner: ExpMemoryLearner):
+        self.user = user
+        self.learner = learner
+        self.lock = threading.Lock()
+        # Monotonic time of the oldest review not yet written back.
+        self.dirty_since = None
+
+
+class LearnerCache:
+    """Process-local LRU cache of per-user ExpMemoryLearner instances.
+
+    Learned states are written behind: a user's dirty states are flushed
+    once their oldest unsaved review is `flush_interval` seconds old, when the
+    user is evicted, or when flush() is called (at the end of a study session
+    and on logout). Each learn() flushes at most the learning user and the
+    least recently used one; with `background_flush` a daemon thread, started
+    by the first learn(), also runs flush_idle() every `flush_interval`
+    seconds so users who stopped sending requests are written back too.
+    close() flushes everyone and is meant to run at process exit; only
+    reviews of a process that dies without it are lost.
+    When `cache_alias` names a Django cache, flushed snapshots are also stored
+    there so other processes can warm up without reading UserMemory.
+
+    Flushes add the reviews made since the last flush to the stored counts
+    and refresh the cached states from them, so several processes can serve
+    the same user. flush() only reaches this process's cache; other
+    processes write their reviews back within two flush intervals.
+    """
+
+    def __init__(
+        self,
+        max_users: int = 1000,
+        flush_interval: float = 30.0,
+        alpha: float = 0.1,
+        beta: float = 0.5,
+        cache_alias: Optional[str] = None,
+        cache_timeout: int = 3600,
+        background_flush: bool = False,
+    ):
+        self.max_users = max_users
+        self.flush_interval = flush_interval
+        self.alpha = alpha
+        self.beta = beta
+        self.cache_alias = cache_alias
+        self.cache_timeout = cache_timeout
+        self.background_flush = background_flush
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+
+    def _shared_cache(self):
+        if not self.cache_alias:
+            return None
+        from django.core.cache import caches
+
+        return caches[self.cache_alias]
+
+    @staticmethod
+    def _cache_key(user_id):
+        return f"learner:{user_id}"
+
+    def _load(self, user) -> ExpMemoryLearner:
+        shared = self._shared_cache()
+        snapshot = shared.get(self._cache_key(user.pk)) if shared else None
+        if snapshot is None:
+            return ExpMemoryLearner.load_memory_from_db(user, alpha=self.alpha, beta=self.beta)
+
+        learner = ExpMemoryLearner(self.alpha, self.beta)
+        for source, target, vocab_id, vocab_list_id, n_occurrences, last_occurrence, alpha, beta in snapshot:
+            item = WordItem(source, target)
+            learner._store(
+                item.get_question(),
+                MemoryState(item, vocab_id, n_occurrences, last_occurrence, alpha, beta, vocab_list_id, stored=True),
+            )
+        return learner
+
+    def _store_snapshot(self, user_id, learner: ExpMemoryLearner):
+        shared = self._shared_cache()
+        if shared is None:
+            return
+        snapshot = [
+            (s.item.source, s.item.target, s.vocab_id, s.vocab_list_id,
+             s.n_occurrences, s.last_occurrence, s.alpha, s.beta)
+            for s in learner.memory.values()
+        ]
+        shared.set(self._cache_key(user_id), snapshot, self.cache_timeout)
+
+    def _entry(self, user) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(user.pk)
+            if entry is not None:
+                self._entries.move_to_end(user.pk)
+                return entry
+
+        entry = _Entry(user, self._load(user))
+        evicted = []
+        with self._lock:
+            # Another thread may have loaded the same user meanwhile.
+            entry = self._entries.setdefault(user.pk, entry)
+            self._entries.move_to_end(user.pk)
+            while len(self._entries) > self.max_users:
+                evicted.append(self._entries.popitem(last=False)[1])
+        for old in evicted:
+            self._flush_entry(old)
+        return entry
+
+    def get(self, user) -> ExpMemoryLearner:
+        return self._entry(user).learner
+
+    def learn(self, user, item: TeachingItem, time: int, vocab_id: int):
+        self.learn_many(user, [(item, vocab_id)], time)
+
+    def learn_many(self, user, items, time: int):
+        """Records several (item, vocab_id) pairs for `user` under one lock."""
+        if self.background_flush and self._flusher is None:
+            # Started here rather than at import, so a server that forks its
+            # workers after loading the app gets a thread in every worker.
+            self.start_flusher()
+        entry = self._entry(user)
+        with entry.lock:
+            for item, vocab_id in items:
+                entry.learner.learn(item, time, vocab_id=vocab_id)
+            if entry.dirty_since is None:
+                entry.dirty_since = _time.monotonic()
+        self._flush_due(entry)
+
+    def _flush_due(self, entry: _Entry):
+        # Checks the learning user and the least recently used one.
+        with self._lock:
+            oldest = next(iter(self._entries.values()), None)
+        candidates = [entry] if oldest is None or oldest is entry else [entry, oldest]
+        now = _time.monotonic()
+        for candidate in candidates:
+            if candidate.dirty_since is not None and now - candidate.dirty_since >= self.flush_interval:
+                self._flush_entry(candidate)
+
+    def _flush_entry(self, entry: _Entry):
+        with entry.lock:
+            entry.dirty_since = None
+            if not any(state.dirty for state in entry.learner.memory.values()):
+                return
+            try:
+                entry.learner.save_memory_to_db_with_retry(entry.user, dirty_only=True, skip_missing=True)
+            except Exception:
+                entry.dirty_since = _time.monotonic()
+                raise
+            self._store_snapshot(entry.user.pk, entry.learner)
+
+    def flush_idle(self):
+        """Writes back every user whose oldest unsaved review is at least
+        `flush_interval` seconds old."""
+        now = _time.monotonic()
+        with self._lock:
+            entries = [
+                entry for entry in self._entries.values()
+                if entry.dirty_since is not None and now - entry.dirty_since >= self.flush_interval
+            ]
+        for entry in entries:
+            self._flush_entry(entry)
+
+    def start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._run_flusher, name="learner-cache-flush", daemon=True)
+        self._flusher.start()
+
+    def _run_flusher(self):
+        from django.db import connections
+
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush_idle()
+            except Exception:
+                logger.exception("Writing back idle learners failed")
+            finally:
+                # The thread's own connections; don't keep them open between runs.
+                connections.close_all()
+
+    def close(self):
+        """Stops the background flusher and writes back every cached user."""
+        with self._lock:
+            flusher, self._flusher = self._flusher, None
+        self._stop.set()
+        if flusher is not None:
+            flusher.join()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Writing back learners at shutdown failed")
+
+    def flush(self, user=None):
+        """Writes dirty states of `user` (or of every cached user) to the DB."""
+        with self._lock:
+            if user is None:
+                entries = list(self._entries.values())
+            else:
+                entries = [self._entries[user.pk]] if user.pk in self._entries else []
+        for entry in entries:
+            self._flush_entry(entry)
+
+    def evict(self, user):
+        with self._lock:
+            entry = self._entries.pop(user.pk, None)
+        if entry is not None:
+            self._flush_entry(entry)
+
+    def clear(self):
+        # Drops every cached learner without flushing.
+        with self._lock:
+            self._entries.clear()
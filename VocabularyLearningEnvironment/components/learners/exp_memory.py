@@ -1,12 +1,17 @@
 from dataclasses import dataclass
-from vocab.models import UserMemory, Vocabulary
+from typing import Optional
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from vocab.models import Member, UserMemory, Vocabulary
 from .base import BaseLearner
 from components.teacher.items import TeachingItem, WordItem
 import numpy as np
 from datetime import datetime, timezone
-from django.db import transaction
-import time
-from django.db import OperationalError, transaction
+from django.db import IntegrityError, transaction
+from vocab.retry import RetryPolicy
+
+# States written per UPDATE, well below the bound-parameter limits.
+SAVE_BATCH_SIZE = 500
 
 
 @dataclass
@@ -17,6 +22,13 @@ class MemoryState:
     last_occurrence: int
     alpha: float
     beta: float
+    vocab_list_id: Optional[int] = None
+    dirty: bool = False
+    # True once the state is known to have a UserMemory row.
+    stored: bool = False
+    # Occurrences learned since the last save; they are added to the row
+    # rather than overwriting it.
+    pending: int = 0
 
     def get_probability(self, time: int):
         return np.exp(
@@ -25,13 +37,123 @@ class MemoryState:
             * (time - self.last_occurrence)
         )
 
+    def get_due_time(self, threshold: float):
+        # Time at which the recall probability drops below `threshold`.
+        rate = self.alpha * (1 - self.beta) ** self.n_occurrences
+        if rate <= 0:
+            return float("inf")
+        return self.last_occurrence + np.log(1 / threshold) / rate
+
+
+class MemoryArrays:
+    """Struct-of-arrays mirror of the learner memory.
+
+    Keeps one slot per question so recall probabilities for many items can be
+    computed with a single vectorized expression instead of a Python loop.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.index = dict()
+        self.questions = []
+        self.n_occurrences = np.zeros(capacity, dtype=np.int64)
+        self.last_occurrence = np.zeros(capacity, dtype=np.float64)
+        self.alpha = np.zeros(capacity, dtype=np.float64)
+        self.beta = np.zeros(capacity, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def _grow(self):
+        capacity = max(2 * len(self.n_occurrences), 1)
+        for name in ("n_occurrences", "last_occurrence", "alpha", "beta"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def set(self, question: str, state: MemoryState):
+        i = self.index.get(question)
+        if i is None:
+            i = len(self.questions)
+            if i == len(self.n_occurrences):
+                self._grow()
+            self.index[question] = i
+            self.questions.append(question)
+        self.n_occurrences[i] = state.n_occurrences
+        self.last_occurrence[i] = state.last_occurrence
+        self.alpha[i] = state.alpha
+        self.beta[i] = state.beta
+
+    def remove(self, question: str):
+        # Moves the last slot into the freed one to keep the arrays dense.
+        i = self.index.pop(question, None)
+        if i is None:
+            return
+        last = len(self.questions) - 1
+        moved = self.questions.pop()
+        if i != last:
+            self.questions[i] = moved
+            self.index[moved] = i
+            for name in ("n_occurrences", "last_occurrence", "alpha", "beta"):
+                arr = getattr(self, name)
+                arr[i] = arr[last]
+
+    def get_probabilities(self, time: int, questions=None):
+        # Questions that were never learned have a recall probability of 0.
+        if questions is None:
+            idx = np.arange(len(self.questions))
+            known = np.ones(len(idx), dtype=bool)
+        else:
+            idx = np.fromiter((self.index.get(q, -1) for q in questions), dtype=np.intp)
+            known = idx >= 0
+            idx = idx[known]
+
+        probabilities = np.zeros(len(known), dtype=np.float64)
+        probabilities[known] = np.exp(
+            -self.alpha[idx]
+            * (1 - self.beta[idx]) ** self.n_occurrences[idx]
+            * (time - self.last_occurrence[idx])
+        )
+        return probabilities
+
+    def get_due_times(self, threshold: float, questions=None):
+        # Vectorized MemoryState.get_due_time; unknown questions get NaN.
+        if questions is None:
+            idx = np.arange(len(self.questions))
+        else:
+            idx = np.fromiter((self.index.get(q, -1) for q in questions), dtype=np.intp)
+        known = idx >= 0
+        idx = idx[known]
+
+        due_times = np.full(len(known), np.nan)
+        rate = self.alpha[idx] * (1 - self.beta[idx]) ** self.n_occurrences[idx]
+        with np.errstate(divide="ignore"):
+            due_times[known] = np.where(
+                rate > 0, self.last_occurrence[idx] + np.log(1 / threshold) / rate, np.inf
+            )
+        return due_times
+
 
 class ExpMemoryLearner(BaseLearner):
     def __init__(self, alpha, beta):
         self.memory = dict()
+        self.arrays = MemoryArrays()
         self.alpha = alpha
         self.beta = beta
 
+    def _store(self, question: str, state: MemoryState):
+        self.memory[question] = state
+        self.arrays.set(question, state)
+
+    def forget(self, question: str):
+        self.memory.pop(question, None)
+        self.arrays.remove(question)
+
+    def get_probabilities(self, time: int, questions=None):
+        """Recall probabilities at `time` for all remembered questions (in
+        `self.arrays.questions` order) or for the given list of questions."""
+        return self.arrays.get_probabilities(time, questions)
+
     def reply(self, question: str, time: int):
         assert isinstance(question, str), "question must be a character string"
         if question in self.memory:
@@ -39,18 +161,22 @@ class ExpMemoryLearner(BaseLearner):
             return self.memory[question].item.get_answer() if memorized else None
         return None
 
-    def learn(self, item: TeachingItem, vocab_id: int, time: int):
+    def learn(self, item: TeachingItem, time: int, vocab_id: Optional[int] = None):
         question = item.get_question()
         if question in self.memory:
-            self.memory[question].n_occurrences += 1
-            self.memory[question].last_occurrence = time
+            state = self.memory[question]
+            state.n_occurrences += 1
+            state.last_occurrence = time
+            state.dirty = True
+            state.pending += 1
         else:
-            state = MemoryState(item, vocab_id, 1, time, self.alpha, self.beta)
-            self.memory[question] = state
+            state = MemoryState(item, vocab_id, 1, time, self.alpha, self.beta, dirty=True, pending=1)
+        self._store(question, state)
 
     
     def load_memory(self, memory_dict):
         self.memory = {}
+        self.arrays = MemoryArrays(max(len(memory_dict), 1))
 
         for question, state in memory_dict.items():
             item = WordItem(state['item']['source'], state['item']['target'])
@@ -63,78 +189,166 @@ class ExpMemoryLearner(BaseLearner):
                 beta=state['beta']
             )
 
-            self.memory[question] = mem_state
+            self._store(question, mem_state)
 
 
-    def save_memory_to_db(self, user):
-        for q, state in self.memory.items():
-            try:
-                vocab = Vocabulary.objects.get(id=state.vocab_id)
-            except Vocabulary.DoesNotExist:
-                raise ValueError(f"Vocabulary with id={state.vocab_id} not found in DB!")
-            
-            user_mem, created = UserMemory.objects.get_or_create(
-                user=user, 
-                vocabulary=vocab,
-                vocabulary_list=vocab.vocabulary_list,
-                
-                defaults={
-                    'n_occurrences': state.n_occurrences,
-                    'last_occurrence': state.last_occurrence,
-                    'alpha': state.alpha,
-                    'beta': state.beta
-                }
+    def save_memory_to_db(self, user, dirty_only=False, skip_missing=False):
+        # Writes the states back; with dirty_only=True only the states touched
+        # by learn() since the last save are written. New rows are inserted in
+        # bulk; existing rows get the occurrences learned since the last save
+        # added to them, so two processes caching the same user don't
+        # overwrite each other's reviews. The saved states are then refreshed
+        # from their rows. With skip_missing=True states whose vocabulary was
+        # deleted in the meantime are forgotten instead of raising.
+        states = [s for s in self.memory.values() if s.dirty or not dirty_only]
+        if not states:
+            return
+
+        lookup_ids = {s.vocab_id for s in states if skip_missing or s.vocab_list_id is None}
+        if lookup_ids:
+            list_ids = dict(
+                Vocabulary.objects.filter(id__in=lookup_ids).values_list("id", "vocabulary_list_id")
             )
-            if not created:
-                user_mem.vocabulary_list = vocab.vocabulary_list
-                user_mem.n_occurrences = state.n_occurrences
-                user_mem.last_occurrence = state.last_occurrence
-                user_mem.alpha = state.alpha
-                user_mem.beta = state.beta
-                with transaction.atomic():
-                    user_mem.save()
+            kept = []
+            for state in states:
+                if state.vocab_id in lookup_ids:
+                    if state.vocab_id not in list_ids:
+                        if not skip_missing:
+                            raise ValueError(f"Vocabulary with id={state.vocab_id} not found in DB!")
+                        self.forget(state.item.get_question())
+                        continue
+                    state.vocab_list_id = list_ids[state.vocab_id]
+                kept.append(state)
+            states = kept
 
+        # Rows another process created since the load are updated, not
+        # inserted; the rows this save inserts advance the user's
+        # learned_word_count.
+        unstored = [s.vocab_id for s in states if not s.stored]
+        existing = set()
+        if unstored:
+            existing = set(
+                UserMemory.objects.filter(user=user, vocabulary_id__in=unstored).values_list("vocabulary_id", flat=True)
+            )
+        new = self._insert_new(user, [s for s in states if not s.stored and s.vocab_id not in existing])
+        if new:
+            Member.objects.filter(pk=user.pk).update(learned_word_count=F("learned_word_count") + len(new))
+
+        new_ids = {s.vocab_id for s in new}
+        for start in range(0, len(states), SAVE_BATCH_SIZE):
+            batch = states[start:start + SAVE_BATCH_SIZE]
+            updated = [s for s in batch if s.vocab_id not in new_ids]
+            if updated:
+                UserMemory.objects.filter(user=user, vocabulary_id__in=[s.vocab_id for s in updated]).update(
+                    n_occurrences=F("n_occurrences") + Case(
+                        *[When(vocabulary_id=s.vocab_id, then=Value(s.pending)) for s in updated], default=Value(0)
+                    ),
+                    last_occurrence=Greatest(
+                        "last_occurrence",
+                        Case(
+                            *[When(vocabulary_id=s.vocab_id, then=Value(s.last_occurrence)) for s in updated],
+                            default=F("last_occurrence"),
+                        ),
+                    ),
+                )
+            self._refresh_states(user, batch)
 
-    def save_memory_to_db_with_retry(self, user, retries=5, delay=0.1):
-        for _ in range(retries):
+    @staticmethod
+    def _insert_new(user, states):
+        # Inserts rows for `states` and returns the states whose rows this
+        # call created. If another process stored some of the words in the
+        # meantime the insert fails as a whole; those words are then left to
+        # the update path and the rest is inserted again.
+        while states:
             try:
                 with transaction.atomic():
-                    self.save_memory_to_db(user)
-                break
-            except OperationalError as e:
-                if 'database is locked' in str(e):
-                    time.sleep(delay)
-                else:
-                    raise
-    @classmethod
-    def load_memory_from_db(cls, user, alpha: float = 0.1, beta: float = 0.5, retries: int = 5, delay: float = 0.1):
-        for attempt in range(retries):
-            try:
-                learner = cls(alpha=alpha, beta=beta)
-                user_memory_qs = UserMemory.objects.select_related("vocabulary").filter(user=user)
-                
-                for user_memory in user_memory_qs:
-                    item = WordItem(source=user_memory.vocabulary.source_word, target=user_memory.vocabulary.target_word)
-                    question=item.get_question()
-        
-                    memory_state = MemoryState(
-                        item=item,
-                        vocab_id=user_memory.vocabulary.id,
-                        n_occurrences=user_memory.n_occurrences,
-                        last_occurrence=user_memory.last_occurrence,
-                        alpha=user_memory.alpha,
-                        beta=user_memory.beta,
+                    UserMemory.objects.bulk_create(
+                        [
+                            UserMemory(
+                                user=user,
+                                vocabulary_id=state.vocab_id,
+                                vocabulary_list_id=state.vocab_list_id,
+                                n_occurrences=state.n_occurrences,
+                                last_occurrence=state.last_occurrence,
+                                alpha=state.alpha,
+                                beta=state.beta,
+                            )
+                            for state in states
+                        ]
                     )
-                
-                    learner.memory[question] = memory_state
-                return learner
-            
-            except OperationalError as e:
-                if 'database is locked' in str(e):
-                    time.sleep(delay)  
-                else:
+                return states
+            except IntegrityError:
+                taken = set(
+                    UserMemory.objects.filter(
+                        user=user, vocabulary_id__in=[s.vocab_id for s in states]
+                    ).values_list("vocabulary_id", flat=True)
+                )
+                if not taken:
                     raise
+                states = [s for s in states if s.vocab_id not in taken]
+        return states
+
+    def _refresh_states(self, user, states):
+        # Takes the saved totals (including other processes' reviews) back
+        # from the rows. A state whose row is gone is written again as new.
+        rows = UserMemory.objects.filter(user=user, vocabulary_id__in=[s.vocab_id for s in states]).values_list(
+            "vocabulary_id", "n_occurrences", "last_occurrence"
+        )
+        saved = {vocab_id: (n_occurrences, last_occurrence) for vocab_id, n_occurrences, last_occurrence in rows}
+        for state in states:
+            if state.vocab_id not in saved:
+                state.stored = False
+                state.dirty = True
+                continue
+            state.n_occurrences, state.last_occurrence = saved[state.vocab_id]
+            state.dirty = False
+            state.stored = True
+            state.pending = 0
+            self._store(state.item.get_question(), state)
+
+    def save_memory_to_db_with_retry(self, user, retries=None, delay=None, dirty_only=False, skip_missing=False):
+        def save():
+            with transaction.atomic():
+                self.save_memory_to_db(user, dirty_only=dirty_only, skip_missing=skip_missing)
+
+        _retry_policy(retries, delay).run(save)
+
+    @classmethod
+    def load_memory_from_db(cls, user, alpha: float = 0.1, beta: float = 0.5, retries=None, delay=None, vocab_ids=None):
+        # vocab_ids restricts the load to the given words, so callers that only
+        # touch a few items don't pay for the user's whole memory.
+        def load():
+            learner = cls(alpha=alpha, beta=beta)
+            user_memory_qs = UserMemory.objects.select_related("vocabulary").filter(user=user)
+            if vocab_ids is not None:
+                user_memory_qs = user_memory_qs.filter(vocabulary_id__in=vocab_ids)
+
+            for user_memory in user_memory_qs:
+                item = WordItem(source=user_memory.vocabulary.source_word, target=user_memory.vocabulary.target_word)
+                question=item.get_question()
+
+                memory_state = MemoryState(
+                    item=item,
+                    vocab_id=user_memory.vocabulary.id,
+                    n_occurrences=user_memory.n_occurrences,
+                    last_occurrence=user_memory.last_occurrence,
+                    alpha=user_memory.alpha,
+                    beta=user_memory.beta,
+                    vocab_list_id=user_memory.vocabulary_list_id,
+                    stored=True,
+                )
+
+                learner._store(question, memory_state)
+            return learner
 
-        raise OperationalError(f"Could not load memory for user {user.id} after {retries} retries")
+        return _retry_policy(retries, delay).run(load)
 
 
+def _retry_policy(retries=None, delay=None):
+    # The project-wide DB_RETRY policy, optionally overridden per call.
+    policy = RetryPolicy.from_settings()
+    if retries is not None:
+        policy.retries = retries
+    if delay is not None:
+        policy.delay = delay
+    return policy
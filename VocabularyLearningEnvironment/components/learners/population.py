@@ -0,0 +1,51 @@
+import numpy as np
+
+
+class ExpMemoryPopulation:
+    """Array-backed population of ExpMemoryLearner-style learners.
+
+    Memory of every (learner, item) pair is held in (n_learners, n_items)
+    arrays so a whole population can be queried, answer and learn in one
+    vectorized step. `alpha` and `beta` may be scalars or per-learner arrays.
+    """
+
+    def __init__(self, n_learners: int, n_items: int, alpha=0.1, beta=0.5, rng=None):
+        self.n_learners = n_learners
+        self.n_items = n_items
+        self.alpha = np.broadcast_to(np.asarray(alpha, dtype=np.float64), (n_learners,))[:, None]
+        self.beta = np.broadcast_to(np.asarray(beta, dtype=np.float64), (n_learners,))[:, None]
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.n_occurrences = np.zeros((n_learners, n_items), dtype=np.int64)
+        self.last_occurrence = np.zeros((n_learners, n_items), dtype=np.float64)
+        self._rows = np.arange(n_learners)
+
+    @property
+    def seen(self):
+        return self.n_occurrences > 0
+
+    def _rates(self):
+        return self.alpha * (1 - self.beta) ** self.n_occurrences
+
+    def get_probabilities(self, time: int):
+        # Items a learner has never seen have a recall probability of 0.
+        probabilities = np.exp(-self._rates() * (time - self.last_occurrence))
+        return np.where(self.seen, probabilities, 0.0)
+
+    def get_due_times(self, threshold: float):
+        # Same as MemoryState.get_due_time; unseen items get NaN.
+        rates = self._rates()
+        with np.errstate(divide="ignore"):
+            due_times = np.where(rates > 0, self.last_occurrence + np.log(1 / threshold) / rates, np.inf)
+        return np.where(self.seen, due_times, np.nan)
+
+    def reply(self, items: np.ndarray, time: int):
+        """Samples whether each learner recalls its queried item (one item
+        index per learner)."""
+        rates = self.alpha[:, 0] * (1 - self.beta[:, 0]) ** self.n_occurrences[self._rows, items]
+        probabilities = np.exp(-rates * (time - self.last_occurrence[self._rows, items]))
+        probabilities[self.n_occurrences[self._rows, items] == 0] = 0.0
+        return self.rng.random(self.n_learners) < probabilities
+
+    def learn(self, items: np.ndarray, time: int):
+        self.n_occurrences[self._rows, items] += 1
+        self.last_occurrence[self._rows, items] = time
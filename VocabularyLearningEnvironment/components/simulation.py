@@ -0,0 +1,119 @@
+import time as _time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, List
+
+import numpy as np
+
+from components.learners.population import ExpMemoryPopulation
+from components.teacher.base import Planner, Teacher
+
+if TYPE_CHECKING:
+    from components.learners.exp_memory import ExpMemoryLearner
+
+
+def make_planner(name: str, threshold: float = 0.5) -> Planner:
+    # Planners are imported lazily: they need Django to be set up.
+    from components.teacher.planners import LowestRecallPlanner, RandomPlanner
+
+    if name == "random":
+        return RandomPlanner()
+    if name == "lowest_recall":
+        return LowestRecallPlanner(threshold=threshold)
+    raise ValueError(f"Unknown planner: {name}")
+
+
+PLANNER_NAMES = ("lowest_recall", "random")
+
+
+@dataclass
+class SimulationResult:
+    n_learners: int
+    n_items: int
+    horizon: int
+    times: List[int] = field(default_factory=list)
+    retention: List[float] = field(default_factory=list)
+    accuracy: List[float] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def final_retention(self):
+        return self.retention[-1] if self.retention else 0.0
+
+    @property
+    def mean_accuracy(self):
+        return float(np.mean(self.accuracy)) if self.accuracy else 0.0
+
+    @property
+    def steps_per_second(self):
+        # Learner-steps (one question to one learner) per second.
+        return self.n_learners * self.horizon / self.elapsed if self.elapsed else 0.0
+
+
+def simulate(
+    planner: Planner,
+    n_items: int,
+    n_learners: int = 1000,
+    horizon: int = 100,
+    alpha=0.1,
+    beta=0.5,
+    seed: int = 0,
+    eval_every: int = 1,
+) -> SimulationResult:
+    """Runs a population of synthetic learners against `planner`.
+
+    Every step each learner is asked one item chosen by planner.choose_batch,
+    replies with probability given by its memory model and then learns the
+    item. Retention is the mean recall probability over all learners and
+    items, recorded every `eval_every` steps and at the end.
+    """
+    rng = np.random.default_rng(seed)
+    population = ExpMemoryPopulation(n_learners, n_items, alpha, beta, rng=rng)
+    result = SimulationResult(n_learners=n_learners, n_items=n_items, horizon=horizon)
+
+    correct = 0
+    asked = 0
+    start = _time.perf_counter()
+    for t in range(horizon):
+        items = planner.choose_batch(population, t, rng)
+        replies = population.reply(items, t)
+        population.learn(items, t)
+        correct += int(replies.sum())
+        asked += n_learners
+
+        if (t + 1) % eval_every == 0 or t == horizon - 1:
+            result.times.append(t + 1)
+            result.retention.append(float(population.get_probabilities(t + 1).mean()))
+            result.accuracy.append(correct / asked)
+            correct = asked = 0
+    result.elapsed = _time.perf_counter() - start
+    return result
+
+
+def run_teacher(teacher: Teacher, learner: "ExpMemoryLearner", horizon: int = 100, eval_every: int = 1) -> SimulationResult:
+    """Runs one `learner` against `teacher` step by step, as components.main
+    does, through the same choose_item/gets_answer path as the app.
+
+    Retention is the learner's mean recall probability over the teacher's
+    material (0 for items it hasn't seen), scored in one vectorized call.
+    """
+    questions = [item.get_question() for item in teacher.material]
+    result = SimulationResult(n_learners=1, n_items=len(questions), horizon=horizon)
+
+    correct = 0
+    asked = 0
+    start = _time.perf_counter()
+    for t in range(horizon):
+        item = teacher.choose_item(t)
+        reply = learner.reply(item.get_question(), t)
+        learner.learn(item, t)
+        teacher.gets_answer(item, reply, t)
+        correct += int(reply == item.get_answer())
+        asked += 1
+
+        if (t + 1) % eval_every == 0 or t == horizon - 1:
+            result.times.append(t + 1)
+            result.retention.append(float(learner.get_probabilities(t + 1, questions).mean()))
+            result.accuracy.append(correct / asked)
+            correct = asked = 0
+    result.elapsed = _time.perf_counter() - start
+    return result
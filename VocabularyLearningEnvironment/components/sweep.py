@@ -0,0 +1,79 @@
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, List
+
+import numpy as np
+
+from components.simulation import make_planner, simulate
+
+FIELDS = [
+    "task", "planner", "alpha", "beta", "horizon", "seed", "n_learners", "n_items",
+    "final_retention", "mean_accuracy", "steps_per_second", "elapsed",
+]
+
+
+def expand_grid(
+    planners: Iterable[str], alphas: Iterable[float], betas: Iterable[float], horizons: Iterable[int], base_seed: int = 0
+) -> List[dict]:
+    # Each task's seed is spawned from the base seed by its grid position, so
+    # results don't depend on worker count or completion order.
+    grid = list(itertools.product(planners, alphas, betas, horizons))
+    seeds = np.random.SeedSequence(base_seed).spawn(len(grid))
+    tasks = []
+    for index, ((planner, alpha, beta, horizon), seed_sequence) in enumerate(zip(grid, seeds)):
+        seed = int(seed_sequence.generate_state(1)[0])
+        tasks.append(
+            {"task": index, "planner": planner, "alpha": alpha, "beta": beta, "horizon": horizon, "seed": seed}
+        )
+    return tasks
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myproject.settings")
+        django.setup()
+
+
+def run_task(task: dict, n_learners: int, n_items: int, threshold: float = 0.5) -> dict:
+    result = simulate(
+        make_planner(task["planner"], threshold=threshold),
+        n_items=n_items,
+        n_learners=n_learners,
+        horizon=task["horizon"],
+        alpha=task["alpha"],
+        beta=task["beta"],
+        seed=task["seed"],
+        eval_every=task["horizon"],
+    )
+    return {
+        **task,
+        "n_learners": n_learners,
+        "n_items": n_items,
+        "final_retention": result.final_retention,
+        "mean_accuracy": result.mean_accuracy,
+        "steps_per_second": result.steps_per_second,
+        "elapsed": result.elapsed,
+    }
+
+
+def run_sweep(tasks: List[dict], out_path: str, n_learners: int, n_items: int, threshold: float = 0.5, max_workers=None):
+    """Runs `tasks` across a process pool and appends one CSV row per task as
+    soon as it finishes. Returns the rows in completion order."""
+    rows = []
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        f.flush()
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(run_task, task, n_learners, n_items, threshold) for task in tasks]
+            for future in as_completed(futures):
+                row = future.result()
+                writer.writerow(row)
+                f.flush()
+                rows.append(row)
+    return rows
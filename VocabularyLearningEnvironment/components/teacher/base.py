@@ -11,6 +11,18 @@ class Planner(ABC):
     ):
         pass
 
+    def update(
+        self, queried_item: TeachingItem, answer, context: PlanningContext, time: int
+    ):
+        pass
+
+    def choose_batch(self, population, time: int, rng):
+        # Vectorized choose_item for offline simulation: one item index per
+        # learner of an ExpMemoryPopulation.
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support batch simulation"
+        )
+
 
 class Teacher:
 
@@ -38,3 +50,4 @@ class Teacher:
 
     def gets_answer(self, queried_item: TeachingItem, answer, time: int):
         self.context.update(queried_item, answer, time)
+        self.planner.update(queried_item, answer, self.context, time)
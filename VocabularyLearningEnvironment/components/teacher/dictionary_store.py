@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+DICTIONARY_DIR = os.path.dirname(__file__)
+
+logger = logging.getLogger(__name__)
+
+
+class DictionaryStore:
+    """Indexed, SQLite-backed word dictionary.
+
+    Entries are stored per language pair with a 1-based frequency rank, so N
+    random words can be drawn by sampling ranks and fetching them through the
+    (src, tgt, rank) index, without loading the dictionary into memory. The
+    store is (re)built from `json_path` whenever the JSON file is newer; the
+    built store lives in settings.DATA_DIR unless `path` is given.
+
+    If the store can't be opened or built, count() is 0 and `error` holds the
+    exception, and callers fall back to wordfreq and online translation.
+    """
+
+    FILENAME = "dictionary.sqlite3"
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        json_path: Optional[str] = os.path.join(DICTIONARY_DIR, "dictionary.json"),
+        src: str = "en",
+        tgt: str = "de",
+    ):
+        self._path = path
+        self.json_path = json_path
+        self.src = src
+        self.tgt = tgt
+        self.error = None
+        self._local = threading.local()
+        self._build_lock = threading.Lock()
+        self._count = None
+
+    @property
+    def path(self):
+        # Resolved on use, so DATA_DIR can still be overridden (tests, the
+        # benchmark command) once the views' planner exists.
+        return self._path or os.path.join(settings.DATA_DIR, self.FILENAME)
+
+    def _needs_build(self):
+        if not self.json_path or not os.path.exists(self.json_path):
+            return False
+        if not os.path.exists(self.path):
+            return True
+        return os.path.getmtime(self.json_path) > os.path.getmtime(self.path)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._build_lock:
+                if self._needs_build():
+                    self.build_from_json(self.json_path)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._create_schema(conn)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _create_schema(conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " src TEXT NOT NULL, tgt TEXT NOT NULL, rank INTEGER NOT NULL,"
+            " source TEXT NOT NULL, target TEXT NOT NULL,"
+            " PRIMARY KEY (src, tgt, rank))"
+        )
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS entries_source ON entries (src, tgt, source)")
+        conn.commit()
+
+    def build(self, entries: Iterable[Tuple[str, str]]):
+        # Ranks follow wordfreq's frequency when it is available; the new file
+        # is swapped in atomically so readers never see a half-built store.
+        entries = list(dict(entries).items())
+        try:
+            from wordfreq import zipf_frequency
+
+            entries.sort(key=lambda e: (-zipf_frequency(e[0], self.src), e[0]))
+        except ImportError:
+            entries.sort()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        conn = sqlite3.connect(tmp_path)
+        try:
+            self._create_schema(conn)
+            if os.path.exists(self.path):
+                # Keep the other language pairs of an existing store.
+                conn.execute("ATTACH DATABASE ? AS old", (self.path,))
+                conn.execute(
+                    "INSERT INTO entries SELECT src, tgt, rank, source, target FROM old.entries"
+                    " WHERE NOT (src = ? AND tgt = ?)",
+                    (self.src, self.tgt),
+                )
+                conn.commit()
+                conn.execute("DETACH DATABASE old")
+            conn.executemany(
+                "INSERT INTO entries (src, tgt, rank, source, target) VALUES (?, ?, ?, ?, ?)",
+                [(self.src, self.tgt, rank, source, target) for rank, (source, target) in enumerate(entries, start=1)],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, self.path)
+        self._local = threading.local()
+        self._count = None
+
+    def build_from_json(self, json_path: str):
+        with open(json_path, "r", encoding="utf-8") as f:
+            self.build(json.load(f).items())
+
+    def count(self) -> int:
+        if self._count is None:
+            try:
+                (count,) = self._connection().execute(
+                    "SELECT COUNT(*) FROM entries WHERE src = ? AND tgt = ?", (self.src, self.tgt)
+                ).fetchone()
+            except (OSError, sqlite3.Error, ValueError) as e:
+                logger.error(
+                    "Dictionary store %s is unavailable, falling back to online translation: %s", self.path, e
+                )
+                self.error = e
+                count = 0
+            self._count = count
+        return self._count
+
+    def lookup(self, word: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT target FROM entries WHERE src = ? AND tgt = ? AND source = ?", (self.src, self.tgt, word)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _fetch_ranks(self, ranks: List[int]) -> List[Tuple[str, str]]:
+        conn = self._connection()
+        rows = []
+        for start in range(0, len(ranks), 500):
+            chunk = ranks[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(
+                conn.execute(
+                    f"SELECT source, target FROM entries WHERE src = ? AND tgt = ? AND rank IN ({placeholders})",
+                    [self.src, self.tgt, *chunk],
+                ).fetchall()
+            )
+        return rows
+
+    def sample(
+        self,
+        n: int,
+        exclude: Optional[Callable[[List[str]], Set[str]]] = None,
+        max_rank: Optional[int] = None,
+        rng: random.Random = random,
+    ) -> List[Tuple[str, str]]:
+        """Draws up to `n` distinct (source, target) pairs among the
+        `max_rank` most frequent entries.
+
+        `exclude` receives each batch of candidate source words and returns the
+        ones to skip, so callers can filter against their own data per batch
+        instead of passing their whole word set.
+        """
+        total = self.count() if max_rank is None else min(max_rank, self.count())
+        chosen = []
+        tried = set()
+        while len(chosen) < n and len(tried) < total:
+            untried = total - len(tried)
+            k = min(untried, 2 * (n - len(chosen)))
+            if len(tried) > total // 2:
+                # Rejection sampling degrades once most ranks are used up.
+                ranks = rng.sample([r for r in range(1, total + 1) if r not in tried], k)
+            else:
+                ranks = []
+                while len(ranks) < k:
+                    rank = rng.randint(1, total)
+                    if rank not in tried:
+                        tried.add(rank)
+                        ranks.append(rank)
+            tried.update(ranks)
+
+            rows = self._fetch_ranks(ranks)
+            skip = exclude([source for source, _ in rows]) if exclude else set()
+            for source, target in rows:
+                if source not in skip and len(chosen) < n:
+                    chosen.append((source, target))
+        return chosen
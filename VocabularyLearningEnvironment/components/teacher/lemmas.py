@@ -0,0 +1,79 @@
+"""Lemma/validity lookups for the word pipeline.
+
+spaCy is only loaded the first time a word is missing from the precomputed
+table. Build the table offline with:
+
+    python -m components.teacher.lemmas --lang en --top 5000
+"""
+import argparse
+import os
+from functools import lru_cache
+
+SPACY_MODEL = "en_core_web_md"
+LEMMA_TABLE_PATH = os.path.join(os.path.dirname(__file__), "lemmas.tsv")
+VALID_POS = {"NOUN", "VERB", "ADJ"}
+
+
+@lru_cache(maxsize=1)
+def get_nlp():
+    import spacy
+
+    return spacy.load(SPACY_MODEL)
+
+
+@lru_cache(maxsize=None)
+def load_lemma_table(path: str = LEMMA_TABLE_PATH):
+    # One "word<TAB>lemma" line per word; an empty lemma marks an invalid word.
+    table = {}
+    if not os.path.exists(path):
+        return table
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            word, _, lemma = line.rstrip("\n").partition("\t")
+            if word:
+                table[word] = lemma or None
+    return table
+
+
+def compute_lemma(word: str):
+    if len(word) < 3:
+        return None
+    nlp = get_nlp()
+    if word.lower() in nlp.Defaults.stop_words:
+        return None
+
+    doc = nlp(word)
+    for token in doc:
+        if token.pos_ in VALID_POS and not token.is_stop and token.pos_ != "PROPN":
+            lemma = token.lemma_.lower()
+            if len(lemma) >= 3:
+                return lemma
+    return None
+
+
+def build_lemma_table(lang: str = "en", top: int = 5000, path: str = LEMMA_TABLE_PATH):
+    import re
+    from wordfreq import top_n_list
+
+    rows = {}
+    for word in top_n_list(lang, top):
+        word_clean = re.sub(r"[^A-Za-z-]", "", word)
+        if word_clean and word_clean not in rows:
+            rows[word_clean] = compute_lemma(word_clean) or ""
+
+    with open(path, "w", encoding="utf-8") as f:
+        for word in sorted(rows):
+            f.write(f"{word}\t{rows[word]}\n")
+    load_lemma_table.cache_clear()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the lemma table used by RandomPlanner.")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--top", type=int, default=5000)
+    parser.add_argument("--output", default=LEMMA_TABLE_PATH)
+    args = parser.parse_args()
+
+    count = build_lemma_table(args.lang, args.top, args.output)
+    print(f"Wrote {count} words to {args.output}")
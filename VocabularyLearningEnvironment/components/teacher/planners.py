@@ -1,124 +1,148 @@
-import html
-import json
-import os
-import requests
+import heapq
+import time as _time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
 from .base import Planner
 from .planning_contexts import PlanningContext
 from typing import List
 from .items import TeachingItem, WordItem
 from wordfreq import top_n_list
 import random
+import numpy as np
 from vocab.models import Vocabulary
-import spacy
+from components.learners.exp_memory import ExpMemoryLearner
+from .lemmas import compute_lemma, load_lemma_table
+from .dictionary_store import DictionaryStore
+from .translation import CachedTranslator, MyMemoryTranslator, TranslationCache, Translator
 import re
 
-nlp = spacy.load("en_core_web_md")
 
 class RandomPlanner(Planner):
+    # Time a translation batch may overrun its deadline, e.g. to finish the
+    # request that timed out on it.
+    DEADLINE_GRACE = 0.5
 
-    def __init__(self, lang="en", top=5000, skip=200, use_json=True):
+    def __init__(
+        self, lang="en", top=5000, skip=200, use_json=True, translator: Translator = None,
+        batch_size=10, max_workers=4, batch_timeout=15.0,
+    ):
         self.lang = lang
         self.top = top
         self.skip = skip
         self.use_json = use_json
-        self.json_words = self.load_words_from_json()
+        self.translator = translator or CachedTranslator(MyMemoryTranslator(), TranslationCache())
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.batch_timeout = batch_timeout
+        self.dictionary = DictionaryStore(src=lang, tgt="de")
         
     def choose_item(
         self, material: List[TeachingItem], context: PlanningContext, time: int
     ):
         return random.choice(material)
+
+    def choose_batch(self, population, time: int, rng):
+        return rng.integers(population.n_items, size=population.n_learners)
     
     def choose_multiple(self, count):
-        if self.use_json and self.json_words: 
-            words = list(self.json_words.keys())
-        else:  
-            words = top_n_list(self.lang, self.top)[self.skip:5000]
+        if self.use_json and self.dictionary.count():
+            return [source for source, _ in self.dictionary.sample(count)]
 
+        words = top_n_list(self.lang, self.top)[self.skip:5000]
         return random.sample(words, min(count, len(words)))
 
     def load_chosen_words(self, count, user):     
         teaching_items = []
         seen = set()
 
-        if self.use_json and self.json_words:  
-            if user:
-                user_words = set(
+        if self.use_json and self.dictionary.count():
+            def exclude_known(words):
+                if not user:
+                    return set()
+                return set(
                     Vocabulary.objects.filter(
-                        vocabulary_list__user=user
+                        vocabulary_list__user=user, source_word__in=words
                     ).values_list('source_word', flat=True)
                 )
-            else:
-                user_words = set()
 
-            available_words = [(s, t) for s, t in self.json_words.items() if s not in user_words]
-
-            chosen_words = random.sample(available_words, min(count, len(available_words)))
-
-            for source, target in chosen_words:
+            for source, target in self.dictionary.sample(count, exclude=exclude_known):
                 seen.add(source)
                 teaching_items.append(WordItem(source, target))
 
         else:
             chosen_words = self.choose_multiple(count * 4)  # oversample
-            for word in chosen_words:
-                word_clean = self.clean_word(word)
-                if not word_clean:
-                    continue
+            teaching_items = self._translate_pipeline(self._iter_lemmas(chosen_words), count)
 
-                lemma = self.is_valid_word(word_clean)
-                if not lemma or lemma in seen:
-                    continue
+        return teaching_items
+    
+    def _iter_lemmas(self, words):
+        seen = set()
+        for word in words:
+            word_clean = self.clean_word(word)
+            if not word_clean:
+                continue
 
-                seen.add(lemma)
+            lemma = self.is_valid_word(word_clean)
+            if not lemma or lemma in seen:
+                continue
 
-                teaching_items.append(
-                    WordItem(source=lemma, target=self.get_translation(lemma, "en", "de"))
-                )
+            seen.add(lemma)
+            yield lemma
 
-                if len(teaching_items) == count:
+    def _translate_pipeline(self, lemmas, count):
+        # Lemma filtering keeps running on this thread while earlier batches
+        # are translated in the pool. The translator stops at the batch
+        # deadline (its requests get the remaining time as their timeout), so
+        # a slow backend returns the part of the batch it managed instead of
+        # holding a worker; the rest is replaced by further candidates from
+        # the oversampled list.
+        teaching_items = []
+        pending = {}
+        exhausted = False
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while len(teaching_items) < count:
+                in_flight = sum(len(batch) for batch, _ in pending.values())
+                while not exhausted and len(teaching_items) + in_flight < count:
+                    batch = list(islice(lemmas, min(self.batch_size, count - len(teaching_items) - in_flight)))
+                    if not batch:
+                        exhausted = True
+                        break
+                    deadline = _time.monotonic() + self.batch_timeout
+                    future = pool.submit(self.translator.translate_many, batch, "en", "de", deadline=deadline)
+                    pending[future] = (batch, deadline + self.DEADLINE_GRACE)
+                    in_flight += len(batch)
+
+                if not pending:
                     break
 
+                next_deadline = min(deadline for _, deadline in pending.values())
+                done, _ = wait(pending, timeout=max(0.0, next_deadline - _time.monotonic()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch, _ = pending.pop(future)
+                    if future.exception() is not None:
+                        continue
+                    translations = future.result()
+                    for lemma in batch:
+                        # Missing or empty translations (timed out or failed)
+                        # are replaced like a dropped batch.
+                        if translations.get(lemma) and len(teaching_items) < count:
+                            teaching_items.append(WordItem(source=lemma, target=translations[lemma]))
+
+                # Only reached by translators that ignore the deadline.
+                now = _time.monotonic()
+                for future, (_, deadline) in list(pending.items()):
+                    if deadline <= now:
+                        future.cancel()
+                        del pending[future]
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
         return teaching_items
-    
-    def load_words_from_json(self):
-        file_path = os.path.join(os.path.dirname(__file__), "dictionary.json")
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data   
-        except Exception as e:
-            print(f"JSON load error: {e}")
-            return {}
-        
-    def clean_translation(self, text: str):
-        if not text:
-            return ""
-        cleaned = text.replace("*", "")
-        cleaned = re.sub(r"\s+", " ", cleaned).strip()
-        first_word = re.split(r"[,/]", cleaned)[0].strip()
-        return first_word
-    
-    def get_translation(self, word: str, src: str = "en", tgt: str = "de"):
-        try:
-            resp = requests.get(
-                "https://api.mymemory.translated.net/get",
-                params={"q": word, "langpair": f"{src}|{tgt}"},
-                timeout=10,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-
-            main = (data.get("responseData") or {}).get("translatedText") or ""
-            raw = html.unescape(main).strip()
-
-            if "*" in raw:
-                cleaned = self.clean_translation(raw)
-            else:
-                cleaned = re.split(r"[,/]", raw)[0].strip()
 
-            return cleaned or ""
-        except Exception:
-            return ""
+    def get_translation(self, word: str, src: str = "en", tgt: str = "de"):
+        return self.translator.translate(word, src, tgt)
 
 
     def clean_word(self, word: str):
@@ -126,15 +150,112 @@ class RandomPlanner(Planner):
             return word_clean if word_clean else None
 
     def is_valid_word(self, word: str):
-        if len(word) < 3:
-            return None
-        if word.lower() in nlp.Defaults.stop_words:
-            return None
-
-        doc = nlp(word)
-        for token in doc:
-            if token.pos_ in {"NOUN", "VERB", "ADJ"} and not token.is_stop and token.pos_ != "PROPN":
-                lemma = token.lemma_.lower()
-                if len(lemma) >= 3:
-                    return lemma
-        return None
\ No newline at end of file
+        # The precomputed table answers for the wordfreq top-N list; spaCy is
+        # only loaded for words outside it.
+        table = load_lemma_table()
+        if word in table:
+            return table[word]
+        return compute_lemma(word)
+
+
+class LowestRecallPlanner(Planner):
+    """Chooses the seen item whose recall dropped below `threshold` earliest.
+
+    Seen items live in a heap keyed by their due time, the time their
+    predicted recall (from the context's ExpMemoryLearner) drops below
+    `threshold`. This is not the same as the lowest recall right now: an item
+    with a slow decay can be further past its due time yet still better
+    remembered than a fast-decaying one. The due time only changes when the
+    item is learned, so the heap is updated in update() and choosing the next
+    item is O(log N) instead of rescoring the whole material. Overdue items
+    come first, then unseen items, then the earliest due item.
+    """
+
+    def __init__(self, threshold: float = 0.5):
+        assert 0 < threshold < 1, "threshold must be between 0 and 1"
+        self.threshold = threshold
+        self._material = None
+        self._items = {}
+        self._heap = []
+        self._versions = {}
+        self._new_items = deque()
+        self._counter = 0
+
+    def _get_learner(self, context: PlanningContext):
+        learner = getattr(context, "learner", None)
+        if not isinstance(learner, ExpMemoryLearner):
+            raise TypeError("LowestRecallPlanner needs a context holding an ExpMemoryLearner")
+        return learner
+
+    def _push(self, question, due_time):
+        self._counter += 1
+        self._versions[question] = self._counter
+        heapq.heappush(self._heap, (due_time, self._counter, question))
+
+    def _rebuild(self, material: List[TeachingItem], learner: ExpMemoryLearner):
+        self._material = material
+        self._items = {item.get_question(): item for item in material}
+        questions = list(self._items)
+        due_times = learner.arrays.get_due_times(self.threshold, questions)
+
+        self._heap = []
+        self._versions = {}
+        self._new_items = deque()
+        for question, due_time in zip(questions, due_times):
+            if np.isnan(due_time):
+                self._new_items.append(question)
+            else:
+                self._counter += 1
+                self._versions[question] = self._counter
+                self._heap.append((float(due_time), self._counter, question))
+        heapq.heapify(self._heap)
+
+    def _peek(self):
+        while self._heap:
+            _, version, question = self._heap[0]
+            if self._versions.get(question) == version:
+                return self._heap[0]
+            heapq.heappop(self._heap)
+        return None
+
+    def choose_item(
+        self, material: List[TeachingItem], context: PlanningContext, time: int
+    ):
+        if material is not self._material:
+            self._rebuild(material, self._get_learner(context))
+
+        while self._new_items and self._new_items[0] in self._versions:
+            self._new_items.popleft()
+
+        top = self._peek()
+        if top is not None and (top[0] <= time or not self._new_items):
+            return self._items[top[2]]
+        return self._items[self._new_items[0]]
+
+    def choose_batch(self, population, time: int, rng):
+        # Same rule as choose_item, evaluated for every learner at once.
+        seen = population.seen
+        due_times = np.where(seen, population.get_due_times(self.threshold), np.inf)
+        earliest = due_times.argmin(axis=1)
+        earliest_due = due_times[np.arange(population.n_learners), earliest]
+        has_new = ~seen.all(axis=1)
+        first_new = (~seen).argmax(axis=1)
+        return np.where((earliest_due <= time) | ~has_new, earliest, first_new)
+
+    def update(
+        self, queried_item: TeachingItem, answer, context: PlanningContext, time: int
+    ):
+        question = queried_item.get_question()
+        if question not in self._items:
+            return
+        state = self._get_learner(context).memory.get(question)
+        if state is None:
+            return
+        self._push(question, float(state.get_due_time(self.threshold)))
+
+        # Drop stale heap entries once they outnumber the live ones.
+        if len(self._heap) > 2 * len(self._versions) + 16:
+            self._heap = [
+                entry for entry in self._heap if self._versions.get(entry[2]) == entry[1]
+            ]
+            heapq.heapify(self._heap)
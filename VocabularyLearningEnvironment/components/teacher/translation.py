@@ -0,0 +1,201 @@
+import html
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Optional
+
+import requests
+from django.conf import settings
+
+
+def clean_translation(text: str):
+    if not text:
+        return ""
+    cleaned = text.replace("*", "")
+    cleaned = re.sub(r"\s+", " ", cleaned).strip()
+    first_word = re.split(r"[,/]", cleaned)[0].strip()
+    return first_word
+
+
+class Translator(ABC):
+    @abstractmethod
+    def translate(self, word: str, src: str = "en", tgt: str = "de", timeout: Optional[float] = None) -> str:
+        pass
+
+    def translate_many(
+        self, words: Iterable[str], src: str = "en", tgt: str = "de", deadline: Optional[float] = None
+    ) -> Dict[str, str]:
+        """Translates `words` one by one. With a `deadline` (time.monotonic())
+        each call gets the remaining time as its timeout, and the words not
+        reached by then are left out of the result."""
+        result = {}
+        for word in words:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+            result[word] = self.translate(word, src, tgt, timeout=timeout)
+        return result
+
+
+class MyMemoryTranslator(Translator):
+    URL = "https://api.mymemory.translated.net/get"
+
+    def __init__(self, url: str = URL, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    def translate(self, word: str, src: str = "en", tgt: str = "de", timeout: Optional[float] = None):
+        try:
+            resp = requests.get(
+                self.url,
+                params={"q": word, "langpair": f"{src}|{tgt}"},
+                timeout=self.timeout if timeout is None else min(self.timeout, timeout),
+            )
+            resp.raise_for_status()
+            data = resp.json()
+
+            main = (data.get("responseData") or {}).get("translatedText") or ""
+            raw = html.unescape(main).strip()
+
+            if "*" in raw:
+                cleaned = clean_translation(raw)
+            else:
+                cleaned = re.split(r"[,/]", raw)[0].strip()
+
+            return cleaned or ""
+        except Exception:
+            return ""
+
+
+class DictionaryTranslator(Translator):
+    """Local stand-in backend that answers from an in-memory word mapping."""
+
+    def __init__(self, entries: Dict[str, str], src: str = "en", tgt: str = "de"):
+        self.entries = entries
+        self.src = src
+        self.tgt = tgt
+
+    def translate(self, word: str, src: str = "en", tgt: str = "de", timeout: Optional[float] = None):
+        if (src, tgt) != (self.src, self.tgt):
+            return ""
+        return self.entries.get(word, "")
+
+
+class TranslationCache:
+    """SQLite-backed (word, src, tgt) -> translation cache.
+
+    Entries expire after `ttl` seconds and the least recently used entries are
+    evicted once the cache holds more than `max_entries` rows.
+    """
+
+    FILENAME = "translation_cache.sqlite3"
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 30 * 24 * 3600, max_entries: int = 100_000):
+        self._path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    @property
+    def path(self):
+        # Defaults to settings.DATA_DIR, resolved on use so it can still be
+        # overridden once the views' planner exists.
+        return self._path or os.path.join(settings.DATA_DIR, self.FILENAME)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " word TEXT NOT NULL, src TEXT NOT NULL, tgt TEXT NOT NULL,"
+                " translation TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (word, src, tgt))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed_at)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, words: Iterable[str], src: str, tgt: str) -> Dict[str, str]:
+        words = list(dict.fromkeys(words))
+        if not words:
+            return {}
+        now = time.time()
+        conn = self._connection()
+        found = {}
+        # Stay well below SQLite's bound-parameter limit.
+        for start in range(0, len(words), 500):
+            chunk = words[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT word, translation FROM translations"
+                f" WHERE src = ? AND tgt = ? AND created_at >= ? AND word IN ({placeholders})",
+                [src, tgt, now - self.ttl, *chunk],
+            ).fetchall()
+            found.update(rows)
+        if found:
+            conn.executemany(
+                "UPDATE translations SET accessed_at = ? WHERE word = ? AND src = ? AND tgt = ?",
+                [(now, word, src, tgt) for word in found],
+            )
+            conn.commit()
+        return found
+
+    def set_many(self, translations: Dict[str, str], src: str, tgt: str):
+        if not translations:
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO translations (word, src, tgt, translation, created_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(word, src, tgt, translation, now, now) for word, translation in translations.items()],
+        )
+        conn.execute("DELETE FROM translations WHERE created_at < ?", (now - self.ttl,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM translations").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM translations WHERE rowid IN"
+                " (SELECT rowid FROM translations ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        conn.commit()
+
+
+class CachedTranslator(Translator):
+    """Serves translations from a TranslationCache and fetches the misses from
+    `backend`.
+
+    Misses are fetched on the calling thread; callers that want concurrency
+    (RandomPlanner._translate_pipeline) run several batches in their own pool.
+    """
+
+    def __init__(self, backend: Translator, cache: TranslationCache):
+        self.backend = backend
+        self.cache = cache
+
+    def translate(self, word: str, src: str = "en", tgt: str = "de", timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        return self.translate_many([word], src, tgt, deadline=deadline).get(word, "")
+
+    def translate_many(
+        self, words: Iterable[str], src: str = "en", tgt: str = "de", deadline: Optional[float] = None
+    ):
+        words = list(dict.fromkeys(words))
+        result = self.cache.get_many(words, src, tgt)
+        misses = [word for word in words if word not in result]
+        if not misses:
+            return result
+
+        fetched = self.backend.translate_many(misses, src, tgt, deadline=deadline)
+        # Empty answers usually mean the backend failed; don't cache them.
+        self.cache.set_many({w: t for w, t in fetched.items() if t}, src, tgt)
+        result.update(fetched)
+        return result
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -59,8 +60,37 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "vocab.instrumentation.InstrumentationMiddleware",
 ]
 
+# Maximum number of DB queries per URL name (vocab.instrumentation). Over-budget
+# requests are logged, or fail when ENFORCE_QUERY_BUDGETS is on (tests).
+
+VIEW_QUERY_BUDGETS = {
+    "random_word_by_id": 12,
+    "submit_answer": 12,
+    "submit_answers": 14,
+    "ack_cards": 10,
+    "study_status": 4,
+    "study_update_time": 8,
+    "progress_check": 5,
+    "quiz_status": 5,
+    "get_public_decks": 4,
+}
+ENFORCE_QUERY_BUDGETS = False
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "vocab.instrumentation": {
+            "handlers": ["console"],
+            "level": os.environ.get("INSTRUMENTATION_LOG_LEVEL", "WARNING"),
+        },
+    },
+}
+
 ROOT_URLCONF = "myproject.urls"
 
 TEMPLATES = [
@@ -84,11 +114,128 @@ WSGI_APPLICATION = "myproject.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# DB_ENGINE=postgres selects the production profile; everything else falls
+# back to SQLite in WAL mode with a busy timeout, so readers don't block the
+# writer and short lock waits are handled by SQLite instead of the app.
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+# Persistent connections are off by default: the polling and SSE views run
+# under ASGI (myproject.asgi), where every request runs in its own thread and
+# a kept-alive connection per thread is never reused, only leaked. Set
+# DB_CONN_MAX_AGE (seconds) for a WSGI-only deployment.
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", "0"))
+
+if DB_ENGINE == "postgres":
+    DB_POOL = os.environ.get("DB_POOL", "1") == "1"
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "vocab"),
+            "USER": os.environ.get("DB_USER", "vocab"),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", "localhost"),
+            "PORT": os.environ.get("DB_PORT", "5432"),
+            # Django's pool (psycopg[pool]) and persistent connections are
+            # mutually exclusive.
+            "CONN_MAX_AGE": 0 if DB_POOL else DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "pool": {
+                    "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+                    "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+                    "timeout": int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "OPTIONS": {
+                # Seconds to wait on a locked database (sqlite busy_timeout).
+                # Each DB_RETRY attempt can wait this long, so keep
+                # timeout x RETRIES within the request timeout.
+                "timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", "5")),
+                # Take the write lock when the transaction starts, so it can't
+                # fail half way on a lock upgrade.
+                "transaction_mode": "IMMEDIATE",
+                "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+            },
+        }
     }
+
+# Local caches and generated stores (translation cache, dictionary store)
+# live here rather than in the source tree.
+
+DATA_DIR = Path(os.environ.get("VOCAB_DATA_DIR", BASE_DIR / "var"))
+
+# Shared retry/backoff policy for transient lock errors (vocab.retry).
+# RETRIES is the number of attempts; with SQLite's 5 s busy timeout a write
+# gives up after about 15 s.
+
+DB_RETRY = {
+    "RETRIES": 3,
+    "DELAY": 0.05,
+    "BACKOFF": 2.0,
+    "MAX_DELAY": 1.0,
+}
+
+
+# Per-user learner state cache (components.learners.cache.LearnerCache).
+# A user's dirty memory states are written back once the oldest is
+# FLUSH_INTERVAL seconds old, on eviction, on logout, when a study session
+# ends and at process exit. BACKGROUND_FLUSH runs a thread per process that
+# writes back users who went idle; without it an idle user's reviews wait for
+# the next request or the exit. Set CACHE_ALIAS to one of the CACHES entries
+# to share flushed snapshots between processes.
+
+LEARNER_CACHE = {
+    "MAX_USERS": 1000,
+    "FLUSH_INTERVAL": 30,
+    "BACKGROUND_FLUSH": True,
+    "CACHE_ALIAS": None,
+}
+
+
+# Server-Sent Events progress stream (vocab.views.study_stream). Snapshots are
+# checked every POLL_INTERVAL seconds (a few queries each, per open tab) and
+# only sent when they change; keep it at least as long as the 10 s polling it
+# replaces. The stream needs an ASGI server (myproject.asgi); under WSGI each
+# stream would hold a worker thread for MAX_DURATION, so it answers 204 there
+# and the pages fall back to polling.
+
+STUDY_STREAM = {
+    "POLL_INTERVAL": 10,
+    "KEEPALIVE": 15,
+    "MAX_DURATION": 300,
+    "RETRY_MS": 5000,
+}
+
+
+# Public deck catalog (vocab.catalog). Pages are cached for CACHE_TIMEOUT
+# seconds in CACHE_ALIAS; use a shared cache backend so invalidations reach
+# every process.
+
+PUBLIC_DECKS = {
+    "PAGE_SIZE": 24,
+    "MAX_PAGE_SIZE": 100,
+    "CACHE_TIMEOUT": 60,
+    "CACHE_ALIAS": "default",
+}
+
+
+# Deck uploads (vocab.views.import_list). Larger files, or files with more
+# rows, are refused before or while they are imported. The defaults take
+# corpora of a few hundred thousand rows; deployments can move either cap
+# through the environment, and 0 lifts it.
+
+DECK_IMPORT = {
+    "MAX_UPLOAD_BYTES": int(os.environ.get("DECK_IMPORT_MAX_UPLOAD_BYTES", str(200 * 1024 * 1024))),
+    "MAX_ROWS": int(os.environ.get("DECK_IMPORT_MAX_ROWS", "1000000")) or None,
 }
 
 
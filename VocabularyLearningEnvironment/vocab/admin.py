@@ -6,14 +6,67 @@ from django.contrib.admin.models import LogEntry
 
 from .models import (
     Vocabulary, Member, VocabularyList, UserAnswer,
-    UserMemory, StudySession, DailyReviewCounter, DailyMinuteCounter, QuizList, QuizHistory
+    UserMemory, StudySession, DailyReviewCounter, DailyMinuteCounter, QuizList, QuizHistory,
+    release_learned_words,
 )
+from .catalog import bump_catalog_version
+from .deck_index import bump_deck_version, deck_indexes
 
-admin.site.register(Vocabulary)
+class VocabularyAdmin(admin.ModelAdmin):
+    # Edits made here change decks after creation, so cached deck indexes
+    # have to be invalidated.
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        bump_deck_version(*{obj.vocabulary_list_id, form.initial.get("vocabulary_list")} - {None})
+
+    def delete_model(self, request, obj):
+        release_learned_words(UserMemory.objects.filter(vocabulary=obj))
+        super().delete_model(request, obj)
+        bump_deck_version(obj.vocabulary_list_id)
+
+    def delete_queryset(self, request, queryset):
+        deck_ids = set(queryset.values_list("vocabulary_list_id", flat=True))
+        release_learned_words(UserMemory.objects.filter(vocabulary__in=queryset))
+        super().delete_queryset(request, queryset)
+        bump_deck_version(*deck_ids)
+
+
+class VocabularyListAdmin(admin.ModelAdmin):
+    # Deleting a deck cascades to its UserMemory rows, which have to leave
+    # the owners' learned_word_count; the catalog and deck index caches are
+    # invalidated like in delete_list.
+    def delete_model(self, request, obj):
+        deck_indexes.evict(obj.pk)
+        release_learned_words(UserMemory.objects.filter(vocabulary_list=obj))
+        super().delete_model(request, obj)
+        if obj.is_public:
+            bump_catalog_version()
+
+    def delete_queryset(self, request, queryset):
+        decks = list(queryset.values_list("pk", "is_public"))
+        for deck_id, _ in decks:
+            deck_indexes.evict(deck_id)
+        release_learned_words(UserMemory.objects.filter(vocabulary_list__in=queryset))
+        super().delete_queryset(request, queryset)
+        if any(is_public for _, is_public in decks):
+            bump_catalog_version()
+
+
+class UserMemoryAdmin(admin.ModelAdmin):
+    def delete_model(self, request, obj):
+        release_learned_words(UserMemory.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        release_learned_words(queryset)
+        super().delete_queryset(request, queryset)
+
+
+admin.site.register(Vocabulary, VocabularyAdmin)
 admin.site.register(Member)
-admin.site.register(VocabularyList)
+admin.site.register(VocabularyList, VocabularyListAdmin)
 admin.site.register(UserAnswer)
-admin.site.register(UserMemory)
+admin.site.register(UserMemory, UserMemoryAdmin)
 admin.site.register(StudySession)
 admin.site.register(DailyReviewCounter)
 admin.site.register(DailyMinuteCounter)
@@ -0,0 +1,235 @@
+"""Benchmarks for the hot request paths.
+
+Run with ``python manage.py benchmark``; the command seeds a throw-away test
+database, so it never touches the configured one.
+"""
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable, List, Optional
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from components.learners.exp_memory import ExpMemoryLearner
+from components.teacher.items import WordItem
+
+from .models import Member, QuizList, StudySession, UserMemory, Vocabulary, VocabularyList
+
+
+@dataclass
+class Dataset:
+    users: List[Member] = field(default_factory=list)
+    deck_sessions: List[StudySession] = field(default_factory=list)
+    quiz_sessions: List[StudySession] = field(default_factory=list)
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    latencies: List[float]
+    queries: List[int]
+
+    def percentile(self, p: float):
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def row(self):
+        return {
+            "name": self.name,
+            "runs": len(self.latencies),
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": max(self.latencies) * 1000,
+            "queries": statistics.mean(self.queries),
+            "max_queries": max(self.queries),
+        }
+
+
+def seed_dataset(users=5, decks=2, words=200, learned=0.5, quiz_questions=20, seed=0) -> Dataset:
+    """Creates `users` members with `decks` decks of `words` words each. A
+    `learned` fraction of every deck gets UserMemory rows, and each user gets
+    one deck session and one quiz session."""
+    rng = random.Random(seed)
+    dataset = Dataset()
+    end_date = timezone.localdate() + timedelta(days=30)
+
+    for u in range(users):
+        user = Member.objects.create(username=f"bench_user_{u}")
+        dataset.users.append(user)
+        learned_words = 0
+        for d in range(decks):
+            deck = VocabularyList.objects.create(
+                list_name=f"deck {d}", description="benchmark", user=user, is_public=rng.random() < 0.5
+            )
+            vocabs = Vocabulary.objects.bulk_create(
+                [
+                    Vocabulary(
+                        source_word=f"word{u}_{d}_{w}",
+                        target_word=f"wort{u}_{d}_{w}",
+                        source_language="en",
+                        target_language="de",
+                        vocabulary_list=deck,
+                    )
+                    for w in range(words)
+                ]
+            )
+            memories = UserMemory.objects.bulk_create(
+                [
+                    UserMemory(
+                        user=user,
+                        vocabulary=vocab,
+                        vocabulary_list=deck,
+                        n_occurrences=rng.randint(1, 5),
+                        last_occurrence=rng.randint(0, 10_000),
+                    )
+                    for vocab in rng.sample(vocabs, int(len(vocabs) * learned))
+                ]
+            )
+            learned_words += len(memories)
+            if d == 0:
+                dataset.deck_sessions.append(
+                    StudySession.objects.create(
+                        user=user, vocabulary_list=deck, name=f"deck session {u}",
+                        goal_type="reviews_per_day", goal_value=10, end_date=end_date,
+                    )
+                )
+
+        from .views import create_quiz_list
+
+        # The memories were bulk-created; create_quiz_list checks the counter.
+        Member.objects.filter(pk=user.pk).update(learned_word_count=learned_words)
+        count = min(quiz_questions, learned_words)
+        if count:
+            quiz_list = create_quiz_list(user=user, question_count=count)
+            dataset.quiz_sessions.append(
+                StudySession.objects.create(
+                    user=user, quiz_list=quiz_list, name=f"quiz session {u}",
+                    goal_type="quiz", goal_value=count, end_date=end_date,
+                )
+            )
+    return dataset
+
+
+def measure(name: str, func: Callable[[], object], iterations: int, setup: Optional[Callable[[], None]] = None):
+    latencies, queries = [], []
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(captured.captured_queries))
+    return BenchmarkResult(name, latencies, queries)
+
+
+def _client(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def run_benchmarks(dataset: Dataset, iterations=50, deck_size=10, seed=0) -> List[BenchmarkResult]:
+    rng = random.Random(seed)
+    user = dataset.users[0]
+    client = _client(user)
+    deck_session = dataset.deck_sessions[0]
+    results = []
+
+    results.append(
+        measure(
+            "random_word_view (deck)",
+            lambda: client.get("/random-word/", {"session_id": deck_session.id}),
+            iterations,
+        )
+    )
+
+    if dataset.quiz_sessions:
+        quiz_session = dataset.quiz_sessions[0]
+
+        def rewind_quiz():
+            QuizList.objects.filter(pk=quiz_session.quiz_list_id).update(cursor=0, asked_count=0, score=0)
+
+        results.append(
+            measure(
+                "random_word_view (quiz)",
+                lambda: client.get("/random-word/", {"session_id": quiz_session.id}),
+                iterations,
+                setup=rewind_quiz,
+            )
+        )
+
+        question_ids = list(QuizList.objects.get(pk=quiz_session.quiz_list_id).question_order)
+        results.append(
+            measure(
+                "submit_answer (quiz)",
+                lambda: client.post(
+                    "/submit-answer/",
+                    {"question_id": rng.choice(question_ids), "given_answer": "x", "session_id": quiz_session.id},
+                ),
+                iterations,
+                setup=rewind_quiz,
+            )
+        )
+
+    # Build the dictionary store before timing create_list.
+    from .views import planner
+
+    planner.dictionary.count()
+    results.append(
+        measure(
+            f"create_list ({deck_size} words)",
+            lambda: client.post(f"/create_list/{deck_size}/", {"list_name": "bench", "description": "", "is_public": ""}),
+            iterations,
+        )
+    )
+
+    from .views import create_quiz_list
+
+    # Words of the seeded quiz session can't be asked again; measure with
+    # what is left.
+    in_quiz = sum(len(s.quiz_list.question_order) for s in dataset.quiz_sessions if s.user_id == user.pk)
+    quiz_size = min(10, UserMemory.objects.filter(user=user).count() - in_quiz)
+    if quiz_size > 0:
+        results.append(
+            measure(
+                f"create_quiz_list ({quiz_size} questions)",
+                lambda: create_quiz_list(user=user, question_count=quiz_size),
+                iterations,
+            )
+        )
+
+    results.append(
+        measure(
+            "ExpMemoryLearner.load_memory_from_db",
+            lambda: ExpMemoryLearner.load_memory_from_db(user),
+            iterations,
+        )
+    )
+
+    learner = ExpMemoryLearner.load_memory_from_db(user)
+    states = list(learner.memory.values())
+    if not states:
+        return results
+
+    def touch_one():
+        state = rng.choice(states)
+        learner.learn(WordItem(state.item.source, state.item.target), int(time.time()), vocab_id=state.vocab_id)
+
+    results.append(measure("save_memory_to_db (full)", lambda: learner.save_memory_to_db(user), iterations))
+    results.append(
+        measure(
+            "save_memory_to_db (one dirty)",
+            lambda: learner.save_memory_to_db(user, dirty_only=True),
+            iterations,
+            setup=touch_one,
+        )
+    )
+    return results
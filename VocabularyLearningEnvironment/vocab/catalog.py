@@ -0,0 +1,91 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count
+
+from .models import VocabularyList
+
+_VERSION_KEY = "public_decks:version"
+
+
+def _cache():
+    return caches[settings.PUBLIC_DECKS["CACHE_ALIAS"]]
+
+
+def _catalog_version(cache):
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        # Start from the clock so pages cached under an evicted version
+        # can't be picked up again.
+        cache.add(_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidates every cached catalog page; call when a deck becomes public
+    or private, or a public deck is created or deleted."""
+    cache = _cache()
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        _catalog_version(cache)
+
+
+def _load_page(after, limit):
+    # The page is picked on the public deck index first. Counting words in
+    # the same query would group, and then sort, every public deck before
+    # the LIMIT applies.
+    ids = list(
+        VocabularyList.objects.filter(is_public=True, id__gt=after)
+        .order_by("id")
+        .values_list("id", flat=True)[: limit + 1]
+    )
+    rows = (
+        VocabularyList.objects.filter(id__in=ids[:limit])
+        .order_by()
+        .values("id", "list_name", "description", "user_id", "user__username")
+        .annotate(word_count=Count("vocabularies"))
+    ) if ids else []
+    decks = sorted(
+        (
+            {
+                "id": row["id"],
+                "list_name": row["list_name"],
+                "description": row["description"],
+                "user_id": row["user_id"],
+                "creator": row["user__username"],
+                "word_count": row["word_count"],
+            }
+            for row in rows
+        ),
+        key=lambda deck: deck["id"],
+    )
+    next_cursor = decks[-1]["id"] if len(ids) > limit else None
+    return decks, next_cursor
+
+
+def public_deck_page(after=0, limit=None, exclude_user=None):
+    """One page of public decks in id order, starting after deck id `after`.
+
+    Returns (decks, next_cursor); next_cursor is None on the last page. Pages
+    are cached for PUBLIC_DECKS["CACHE_TIMEOUT"] seconds and shared by all
+    users, so decks of `exclude_user` are dropped afterwards and a page can
+    come back shorter than `limit`.
+    """
+    conf = settings.PUBLIC_DECKS
+    limit = min(limit or conf["PAGE_SIZE"], conf["MAX_PAGE_SIZE"])
+    cache = _cache()
+    version = _catalog_version(cache)
+    key = f"public_decks:{after}:{limit}"
+
+    page = cache.get(key, version=version)
+    if page is None:
+        page = _load_page(after, limit)
+        cache.set(key, page, conf["CACHE_TIMEOUT"], version=version)
+
+    decks, next_cursor = page
+    if exclude_user is not None:
+        decks = [deck for deck in decks if deck["user_id"] != exclude_user.pk]
+    return decks, next_cursor
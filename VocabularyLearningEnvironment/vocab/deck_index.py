@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+
+from django.db.models import F
+
+from components.teacher.items import WordItem
+from .models import Vocabulary, VocabularyList
+
+
+class DeckIndex(Sequence):
+    """Read-only sequence of a deck's words, as seen by the planners.
+
+    Rows are kept as parallel tuples and a WordItem is only created for the
+    positions that are read, so random.choice() on a 10k-word deck doesn't
+    allocate 10k items per request.
+    """
+
+    def __init__(self, deck_id, version, ids, sources, targets):
+        self.deck_id = deck_id
+        self.version = version
+        self.ids = tuple(ids)
+        self.sources = tuple(sources)
+        self.targets = tuple(targets)
+        self._ids_by_word = dict(zip(zip(self.sources, self.targets), self.ids))
+
+    @classmethod
+    def load(cls, deck):
+        rows = Vocabulary.objects.filter(vocabulary_list=deck).order_by("id").values_list(
+            "id", "source_word", "target_word"
+        )
+        ids, sources, targets = zip(*rows) if rows else ((), (), ())
+        return cls(deck.pk, deck.version, ids, sources, targets)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return WordItem(source=self.sources[i], target=self.targets[i])
+
+    def vocab_id(self, item: WordItem):
+        return self._ids_by_word[(item.source, item.target)]
+
+
+class DeckIndexCache:
+    """Process-local LRU cache of DeckIndex objects keyed by deck id.
+
+    An entry is reused only while its version matches the deck row, which the
+    callers load anyway, so a bump in any process invalidates it everywhere.
+    """
+
+    def __init__(self, max_decks: int = 256):
+        self.max_decks = max_decks
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, deck: VocabularyList) -> DeckIndex:
+        with self._lock:
+            index = self._indexes.get(deck.pk)
+            if index is not None and index.version == deck.version:
+                self._indexes.move_to_end(deck.pk)
+                return index
+
+        index = DeckIndex.load(deck)
+        with self._lock:
+            self._indexes[deck.pk] = index
+            self._indexes.move_to_end(deck.pk)
+            while len(self._indexes) > self.max_decks:
+                self._indexes.popitem(last=False)
+        return index
+
+    def evict(self, deck_id):
+        with self._lock:
+            self._indexes.pop(deck_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+deck_indexes = DeckIndexCache()
+
+
+def bump_deck_version(*deck_ids):
+    """Marks the given decks as changed; call after adding, editing or
+    removing Vocabulary rows outside of deck creation."""
+    VocabularyList.objects.filter(pk__in=deck_ids).update(version=F("version") + 1)
@@ -0,0 +1,236 @@
+"""Streaming import and export of decks.
+
+Supported formats are CSV, TSV, JSON lines and Anki's plain-text note
+export. Files are parsed line by line and written in bulk_create batches,
+so neither the file nor the rows of a large corpus are held in memory.
+Each batch commits on its own so an import doesn't hold the database write
+lock for the whole file.
+"""
+import csv
+import io
+import json
+import os
+import re
+from dataclasses import dataclass
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from django.db import transaction
+
+from .catalog import bump_catalog_version
+from .deck_index import bump_deck_version
+from .models import Vocabulary, VocabularyList
+
+FORMATS = ("csv", "tsv", "jsonl", "anki")
+BATCH_SIZE = 1000
+
+# Content type and file extension of exported decks.
+EXPORT_MEDIA = {
+    "csv": ("text/csv", "csv"),
+    "tsv": ("text/tab-separated-values", "tsv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "anki": ("text/plain", "txt"),
+}
+
+_EXTENSIONS = {".csv": "csv", ".tsv": "tsv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".txt": "anki"}
+_ANKI_SEPARATORS = {"tab": "\t", "comma": ",", "semicolon": ";", "space": " ", "pipe": "|", "colon": ":"}
+_HEADER = {"source", "source_word", "front"}
+_HTML_TAG = re.compile(r"<[^>]+>")
+_WORD_LENGTH = Vocabulary._meta.get_field("source_word").max_length
+
+
+class DeckImportError(ValueError):
+    """The file can't be imported; the message says why."""
+
+
+@dataclass
+class Entry:
+    source: str
+    target: str
+    source_language: Optional[str] = None
+    target_language: Optional[str] = None
+
+
+@dataclass
+class ImportResult:
+    deck: VocabularyList
+    imported: int
+    skipped: int
+
+
+def guess_format(filename: str) -> Optional[str]:
+    return _EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+
+
+def _entry(source, target, source_language=None, target_language=None):
+    # NUL bytes are dropped: PostgreSQL refuses them in text columns.
+    source, target = (source or "").replace("\0", "").strip(), (target or "").replace("\0", "").strip()
+    if not source or not target or len(source) > _WORD_LENGTH or len(target) > _WORD_LENGTH:
+        return None
+    return Entry(source, target, source_language or None, target_language or None)
+
+
+def _delimited_entries(lines, delimiter, columns=4):
+    reader = csv.reader(lines, delimiter=delimiter)
+    try:
+        for i, row in enumerate(reader):
+            if i == 0 and row and row[0].strip().lower() in _HEADER:
+                continue
+            if not row:
+                continue
+            yield _entry(*row[:columns]) if len(row) >= 2 else None
+    except csv.Error as e:
+        # e.g. a field over csv.field_size_limit() or an unclosed quote
+        raise DeckImportError(f"Line {reader.line_num}: {e}.") from e
+
+
+def _jsonl_entries(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            yield _entry(
+                row.get("source", row.get("source_word")),
+                row.get("target", row.get("target_word")),
+                row.get("source_language"),
+                row.get("target_language"),
+            )
+        except (ValueError, AttributeError):
+            yield None
+
+
+def _anki_entries(lines):
+    # Anki writes "#key:value" header lines before the notes, e.g.
+    # "#separator:tab" and "#html:true"; only the first two fields (front and
+    # back) are used.
+    separator, html = "\t", False
+    notes = iter(lines)
+    for line in notes:
+        if not line.startswith("#"):
+            notes = _prepend(line, notes)
+            break
+        key, _, value = line[1:].strip().partition(":")
+        if key == "separator":
+            separator = _ANKI_SEPARATORS.get(value.lower(), value[:1] or "\t")
+        elif key == "html":
+            html = value.lower() == "true"
+
+    for entry in _delimited_entries(notes, separator, columns=2):
+        if entry is not None and html:
+            entry = _entry(_HTML_TAG.sub("", entry.source), _HTML_TAG.sub("", entry.target))
+        yield entry
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+def iter_entries(lines: Iterable[str], fmt: str) -> Iterator[Optional[Entry]]:
+    """Parses `lines` lazily; rows that can't be imported yield None."""
+    if fmt == "csv":
+        return _delimited_entries(lines, ",")
+    if fmt == "tsv":
+        return _delimited_entries(lines, "\t")
+    if fmt == "jsonl":
+        return _jsonl_entries(lines)
+    if fmt == "anki":
+        return _anki_entries(lines)
+    raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}.")
+
+
+def import_deck(
+    user, lines: Iterable[str], fmt: str, name: str = "", description: str = "", is_public: bool = False,
+    deck: Optional[VocabularyList] = None, source_language: str = "en", target_language: str = "de",
+    batch_size: int = BATCH_SIZE, max_rows: Optional[int] = None,
+) -> ImportResult:
+    """Creates a deck for `user` (or appends to `deck`) from `lines`.
+
+    Rows are written in bulk_create batches of `batch_size`, each in its own
+    transaction. A new deck is only made public once all of its rows are in,
+    and is deleted again if the import fails; words already appended to an
+    existing `deck` stay. Raises DeckImportError for files that can't be
+    parsed or have more than `max_rows` rows.
+    """
+    entries = iter_entries(lines, fmt)
+    appending = deck is not None
+    imported = skipped = 0
+
+    if deck is None:
+        deck = VocabularyList.objects.create(list_name=name, description=description, user=user)
+    try:
+        batch = []
+        for entry in entries:
+            if max_rows is not None and imported + len(batch) + skipped >= max_rows:
+                raise DeckImportError(f"The file has more than {max_rows} rows.")
+            if entry is None:
+                skipped += 1
+                continue
+            batch.append(
+                Vocabulary(
+                    source_word=entry.source,
+                    target_word=entry.target,
+                    source_language=entry.source_language or source_language,
+                    target_language=entry.target_language or target_language,
+                    vocabulary_list=deck,
+                )
+            )
+            if len(batch) >= batch_size:
+                with transaction.atomic():
+                    Vocabulary.objects.bulk_create(batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                Vocabulary.objects.bulk_create(batch)
+            imported += len(batch)
+    except BaseException:
+        if not appending:
+            deck.delete()
+        raise
+    finally:
+        if appending and imported:
+            bump_deck_version(deck.pk)
+            if deck.is_public:
+                bump_catalog_version()
+
+    if not appending and is_public:
+        VocabularyList.objects.filter(pk=deck.pk).update(is_public=True)
+        deck.is_public = True
+        bump_catalog_version()
+    return ImportResult(deck, imported, skipped)
+
+
+def export_deck(deck: VocabularyList, fmt: str, chunk_size: int = BATCH_SIZE) -> Iterator[str]:
+    """Yields `deck` in `fmt` as text chunks of about `chunk_size` rows."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}.")
+
+    rows = (
+        Vocabulary.objects.filter(vocabulary_list=deck)
+        .order_by("id")
+        .values_list("source_word", "target_word", "source_language", "target_language")
+        .iterator(chunk_size=chunk_size)
+    )
+    delimiter = "," if fmt == "csv" else "\t"
+    if fmt == "anki":
+        yield "#separator:tab\n#html:false\n"
+    elif fmt != "jsonl":
+        yield delimiter.join(("source", "target", "source_language", "target_language")) + "\n"
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        buffer = io.StringIO()
+        if fmt == "jsonl":
+            for source, target, source_language, target_language in chunk:
+                buffer.write(json.dumps({
+                    "source": source, "target": target,
+                    "source_language": source_language, "target_language": target_language,
+                }, ensure_ascii=False) + "\n")
+        else:
+            writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+            writer.writerows(chunk if fmt != "anki" else (row[:2] for row in chunk))
+        yield buffer.getvalue()
@@ -1,6 +1,7 @@
 from django import forms
 from .models import Member, QuizList, StudySession, VocabularyList
 from django.db.models import Q
+from django.utils.choices import CallableChoiceIterator
 
 class MemberForm(forms.ModelForm):
   password = forms.CharField(widget=forms.PasswordInput)  
@@ -12,13 +13,28 @@ class MemberForm(forms.ModelForm):
 class StudySessionForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user", None) 
+        public_decks = kwargs.pop("public_decks", ())
         super().__init__(*args, **kwargs)
+        # Any public deck validates, but the select only lists the user's own
+        # decks and the catalog pages already loaded (`public_decks`, as
+        # returned by catalog.public_deck_page); the page appends the rest.
         if user is not None:
-            qs = VocabularyList.objects.filter(Q(user=user) | Q(is_public=True)).distinct()
+            qs = VocabularyList.objects.filter(Q(user=user) | Q(is_public=True))
+            own = VocabularyList.objects.filter(user=user).order_by("id").values_list("id", "list_name")
+            quiz_lists = QuizList.objects.filter(user=user)
         else:
             qs = VocabularyList.objects.filter(is_public=True)
+            own = []
+            quiz_lists = QuizList.objects.none()
 
         self.fields["vocabulary_list"].queryset = qs
+        # Built when the select renders, so a valid POST doesn't read the decks.
+        self.fields["vocabulary_list"].widget.choices = CallableChoiceIterator(lambda: [
+            ("", self.fields["vocabulary_list"].empty_label),
+            *own,
+            ("Public decks", [(deck["id"], f'{deck["list_name"]} ({deck["creator"]})') for deck in public_decks]),
+        ])
+        self.fields["quiz_list"].queryset = quiz_lists
         self.fields["name"].widget.attrs["placeholder"] = "Session name"
         self.fields["goal_value"].widget.attrs["placeholder"] = "Goal value"
         self.fields["start_date"].widget.attrs["placeholder"] = "Start date"
@@ -0,0 +1,184 @@
+"""Per-view wall time, query count and DB time instrumentation.
+
+InstrumentationMiddleware wraps every request in ``connection.execute_wrapper``
+and aggregates the numbers per URL name in ``view_stats``. Superusers can read
+the aggregates at ``instrumentation/``; every request is also logged to the
+``vocab.instrumentation`` logger. Per-view query budgets come from
+``settings.VIEW_QUERY_BUDGETS``; with ``ENFORCE_QUERY_BUDGETS`` on (as in the
+tests) exceeding one raises QueryBudgetExceeded instead of logging a warning.
+"""
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger("vocab.instrumentation")
+
+UNRESOLVED = "<unresolved>"
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    """execute_wrapper that counts queries and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class ViewStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, view_name, duration, queries, db_time):
+        with self._lock:
+            stats = self._stats.setdefault(
+                view_name,
+                {"requests": 0, "total_time": 0.0, "max_time": 0.0, "total_queries": 0, "max_queries": 0, "total_db_time": 0.0},
+            )
+            stats["requests"] += 1
+            stats["total_time"] += duration
+            stats["max_time"] = max(stats["max_time"], duration)
+            stats["total_queries"] += queries
+            stats["max_queries"] = max(stats["max_queries"], queries)
+            stats["total_db_time"] += db_time
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    "requests": s["requests"],
+                    "avg_ms": s["total_time"] / s["requests"] * 1000,
+                    "max_ms": s["max_time"] * 1000,
+                    "avg_queries": s["total_queries"] / s["requests"],
+                    "max_queries": s["max_queries"],
+                    "avg_db_ms": s["total_db_time"] / s["requests"] * 1000,
+                }
+                for name, s in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+view_stats = ViewStats()
+
+
+def check_budget(view_name, queries):
+    budget = settings.VIEW_QUERY_BUDGETS.get(view_name)
+    if budget is None or queries <= budget:
+        return
+    message = f"{view_name} ran {queries} queries (budget {budget})"
+    if settings.ENFORCE_QUERY_BUDGETS:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+@contextmanager
+def query_budget(max_queries):
+    """Fails the enclosed block if it runs more than `max_queries` queries."""
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+    if counter.count > max_queries:
+        raise QueryBudgetExceeded(f"{counter.count} queries ran (budget {max_queries})")
+
+
+# Each backend's EXPLAIN prefix and the plan lines that mean a whole table or
+# index is read, or rows are sorted outside an index. SQLite writes the walk
+# of a whole index as "SCAN <table> USING COVERING INDEX ..." and a sort as
+# "USE TEMP B-TREE FOR ORDER BY".
+_PLAN_PROBLEMS = {
+    "sqlite": ("EXPLAIN QUERY PLAN ", re.compile(r"\bSCAN (\w+)|\bUSE (TEMP B-TREE FOR [A-Z ]+)")),
+    "postgresql": ("EXPLAIN ", re.compile(r"\bSeq Scan on (\w+)|\b(Sort)  \(")),
+}
+
+
+def plan_problems(sql, params=()):
+    """Tables the database plans to read in full for `sql`, and the sorts it
+    can't take from an index, parsed from its EXPLAIN output. Unknown backends
+    report none."""
+    prefix, pattern = _PLAN_PROBLEMS.get(connection.vendor, (None, None))
+    if pattern is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        plan = "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    return sorted({"".join(groups).strip() for groups in pattern.findall(plan)})
+
+
+def full_table_scans(queryset):
+    """plan_problems() of `queryset`."""
+    return plan_problems(*queryset.query.sql_with_params())
+
+
+def _install_counter(counter):
+    connection.execute_wrappers.append(counter)
+
+
+def _remove_counter(counter):
+    connection.execute_wrappers.remove(counter)
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        return self._finish(request, response, counter, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        # Async ORM calls run in the request's thread-sensitive worker thread,
+        # so the wrapper has to be installed on that thread's connection.
+        counter = QueryCounter()
+        start = time.perf_counter()
+        await sync_to_async(_install_counter)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_counter)(counter)
+        return self._finish(request, response, counter, time.perf_counter() - start)
+
+    def _finish(self, request, response, counter, duration):
+        match = getattr(request, "resolver_match", None)
+        # Unmatched paths (404s, scanners) share one key so the stats stay
+        # bounded.
+        view_name = (match.view_name if match else None) or UNRESOLVED
+        view_stats.record(view_name, duration, counter.count, counter.duration)
+        logger.debug(
+            "%s %s %.1fms %d queries %.1fms db",
+            request.method, view_name, duration * 1000, counter.count, counter.duration * 1000,
+        )
+        response["Server-Timing"] = f"app;dur={duration * 1000:.1f}, db;dur={counter.duration * 1000:.1f}"
+        check_budget(view_name, counter.count)
+        return response
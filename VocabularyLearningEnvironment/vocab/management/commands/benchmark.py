@@ -0,0 +1,56 @@
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from vocab.benchmarks import run_benchmarks, seed_dataset
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the hot request paths against a seeded throw-away database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5)
+        parser.add_argument("--decks", type=int, default=2, help="Decks per user.")
+        parser.add_argument("--words", type=int, default=200, help="Words per deck.")
+        parser.add_argument("--learned", type=float, default=0.5, help="Fraction of words with a UserMemory row.")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--deck-size", type=int, default=10, help="Words per create_list call.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        for name in ("users", "decks", "words", "iterations", "deck_size"):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+        if not 0 <= options["learned"] <= 1:
+            raise CommandError("--learned must be between 0 and 1.")
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # The dictionary store and translation cache are thrown away as well.
+        with tempfile.TemporaryDirectory() as data_dir, override_settings(DATA_DIR=data_dir):
+            try:
+                dataset = seed_dataset(
+                    users=options["users"],
+                    decks=options["decks"],
+                    words=options["words"],
+                    learned=options["learned"],
+                    seed=options["seed"],
+                )
+                results = run_benchmarks(
+                    dataset, iterations=options["iterations"], deck_size=options["deck_size"], seed=options["seed"]
+                )
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        self.stdout.write(
+            f"{'benchmark':<40} {'runs':>5} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'queries':>8} {'max q':>6}"
+        )
+        for result in results:
+            row = result.row()
+            self.stdout.write(
+                f"{row['name']:<40} {row['runs']:>5} {row['p50_ms']:>9.2f} {row['p90_ms']:>9.2f} "
+                f"{row['p99_ms']:>9.2f} {row['max_ms']:>9.2f} {row['queries']:>8.1f} {row['max_queries']:>6}"
+            )
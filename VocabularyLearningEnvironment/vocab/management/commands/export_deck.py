@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vocab import deck_io
+from vocab.models import VocabularyList
+
+
+class Command(BaseCommand):
+    help = "Exports a deck as CSV, TSV, JSONL or an Anki text file, streaming it in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("deck_id", type=int)
+        parser.add_argument("--format", choices=deck_io.FORMATS, default="csv")
+        parser.add_argument("--output", help="File to write; defaults to stdout.")
+
+    def handle(self, *args, **options):
+        deck = VocabularyList.objects.filter(pk=options["deck_id"]).first()
+        if deck is None:
+            raise CommandError(f"No deck with id {options['deck_id']}.")
+
+        chunks = deck_io.export_deck(deck, options["format"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as out:
+                out.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
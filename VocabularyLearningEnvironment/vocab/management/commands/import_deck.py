@@ -0,0 +1,61 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vocab import deck_io
+from vocab.models import Member, VocabularyList
+
+
+class Command(BaseCommand):
+    help = "Imports a CSV, TSV, JSONL or Anki text file as a deck, streaming it in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=deck_io.FORMATS, help="Defaults to the file extension.")
+        parser.add_argument("--name", help="Deck name; defaults to the file name.")
+        parser.add_argument("--description", default="")
+        parser.add_argument("--public", action="store_true")
+        parser.add_argument("--deck", type=int, help="Append to this existing deck of the user instead.")
+        parser.add_argument("--source-language", default="en")
+        parser.add_argument("--target-language", default="de")
+        parser.add_argument("--batch-size", type=int, default=deck_io.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = Member.objects.get(username=options["username"])
+        except Member.DoesNotExist:
+            raise CommandError(f"No member named {options['username']!r}.")
+
+        fmt = options["format"] or deck_io.guess_format(options["path"])
+        if fmt is None:
+            raise CommandError("Can't tell the format from the file name; pass --format.")
+
+        deck = None
+        if options["deck"] is not None:
+            deck = VocabularyList.objects.filter(pk=options["deck"], user=user).first()
+            if deck is None:
+                raise CommandError(f"{user.username} has no deck with id {options['deck']}.")
+
+        name = options["name"] or os.path.splitext(os.path.basename(options["path"]))[0][:100]
+        try:
+            with open(options["path"], encoding="utf-8-sig", errors="replace", newline="") as lines:
+                result = deck_io.import_deck(
+                    user,
+                    lines,
+                    fmt,
+                    name=name,
+                    description=options["description"],
+                    is_public=options["public"],
+                    deck=deck,
+                    source_language=options["source_language"],
+                    target_language=options["target_language"],
+                    batch_size=options["batch_size"],
+                )
+        except deck_io.DeckImportError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.imported} words into deck {result.deck.id} "{result.deck.list_name}" '
+            f"({result.skipped} rows skipped)."
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from vocab.models import Member, recount_learned_words
+
+
+class Command(BaseCommand):
+    help = "Recomputes Member.learned_word_count from the UserMemory table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*", help="Only recount these members.")
+
+    def handle(self, *args, **options):
+        members = Member.objects.all()
+        if options["usernames"]:
+            members = members.filter(username__in=options["usernames"])
+        recount_learned_words(members)
+        self.stdout.write(self.style.SUCCESS(f"Recounted learned words for {members.count()} member(s)."))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from components.simulation import PLANNER_NAMES, make_planner, simulate
+
+
+class Command(BaseCommand):
+    help = "Simulates a population of synthetic learners against a planner and reports retention."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--planner", choices=PLANNER_NAMES, default="lowest_recall")
+        parser.add_argument("--learners", type=int, default=1000)
+        parser.add_argument("--items", type=int, default=200)
+        parser.add_argument("--horizon", type=int, default=200)
+        parser.add_argument("--alpha", type=float, default=0.1)
+        parser.add_argument("--beta", type=float, default=0.5)
+        parser.add_argument("--threshold", type=float, default=0.5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--points", type=int, default=10, help="Number of retention curve points to print.")
+
+    def handle(self, *args, **options):
+        if options["learners"] <= 0 or options["items"] <= 0 or options["horizon"] <= 0:
+            raise CommandError("--learners, --items and --horizon must be positive.")
+
+        planner = make_planner(options["planner"], threshold=options["threshold"])
+        result = simulate(
+            planner,
+            n_items=options["items"],
+            n_learners=options["learners"],
+            horizon=options["horizon"],
+            alpha=options["alpha"],
+            beta=options["beta"],
+            seed=options["seed"],
+            eval_every=max(1, options["horizon"] // max(1, options["points"])),
+        )
+
+        self.stdout.write(f"{'step':>8} {'retention':>10} {'accuracy':>10}")
+        for t, retention, accuracy in zip(result.times, result.retention, result.accuracy):
+            self.stdout.write(f"{t:>8} {retention:>10.4f} {accuracy:>10.4f}")
+        self.stdout.write(
+            f"final retention {result.final_retention:.4f} | "
+            f"{result.steps_per_second:,.0f} learner-steps/s ({result.elapsed:.2f}s)"
+        )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from components.simulation import PLANNER_NAMES
+from components.sweep import expand_grid, run_sweep
+
+
+class Command(BaseCommand):
+    help = "Evaluates planner x alpha x beta x horizon grids in parallel and writes the results to CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--planners", nargs="+", choices=PLANNER_NAMES, default=list(PLANNER_NAMES))
+        parser.add_argument("--alphas", nargs="+", type=float, default=[0.1])
+        parser.add_argument("--betas", nargs="+", type=float, default=[0.5])
+        parser.add_argument("--horizons", nargs="+", type=int, default=[100])
+        parser.add_argument("--learners", type=int, default=1000)
+        parser.add_argument("--items", type=int, default=200)
+        parser.add_argument("--threshold", type=float, default=0.5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--workers", type=int, default=None, help="Defaults to the number of CPUs.")
+        parser.add_argument("--output", default="sweep.csv")
+
+    def handle(self, *args, **options):
+        if options["learners"] <= 0 or options["items"] <= 0 or min(options["horizons"]) <= 0:
+            raise CommandError("--learners, --items and --horizons must be positive.")
+
+        tasks = expand_grid(
+            options["planners"], options["alphas"], options["betas"], options["horizons"], base_seed=options["seed"]
+        )
+        self.stdout.write(f"Running {len(tasks)} tasks...")
+        rows = run_sweep(
+            tasks,
+            options["output"],
+            n_learners=options["learners"],
+            n_items=options["items"],
+            threshold=options["threshold"],
+            max_workers=options["workers"],
+        )
+        best = max(rows, key=lambda row: row["final_retention"])
+        self.stdout.write(
+            f"Wrote {len(rows)} rows to {options['output']}. Best: {best['planner']} "
+            f"alpha={best['alpha']} beta={best['beta']} horizon={best['horizon']} "
+            f"retention={best['final_retention']:.4f}"
+        )
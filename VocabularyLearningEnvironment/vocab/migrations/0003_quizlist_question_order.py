@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:06
+
+import random
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def materialize_question_order(apps, schema_editor):
+    # Questions already asked go first so the cursor can resume the quiz.
+    QuizList = apps.get_model("vocab", "QuizList")
+    Vocabulary = apps.get_model("vocab", "Vocabulary")
+    UserMemory = apps.get_model("vocab", "UserMemory")
+
+    for quiz in QuizList.objects.all():
+        vocab_ids = list(Vocabulary.objects.filter(quiz_list=quiz).values_list("id", flat=True))
+        asked = set(
+            UserMemory.objects.filter(
+                user_id=quiz.user_id, vocabulary_id__in=vocab_ids, is_asked_in_quiz=True
+            ).values_list("vocabulary_id", flat=True)
+        )
+        pending = [vid for vid in vocab_ids if vid not in asked]
+        random.shuffle(pending)
+        quiz.question_order = [vid for vid in vocab_ids if vid in asked] + pending
+        quiz.cursor = len(asked)
+        quiz.save(update_fields=["question_order", "cursor"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0002_quizlist_name'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='useranswer',
+            name='answer_time',
+        ),
+        migrations.AddField(
+            model_name='quizlist',
+            name='cursor',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quizlist',
+            name='question_order',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='quiz_list',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='vocab.quizlist'),
+        ),
+        migrations.RunPython(materialize_question_order, migrations.RunPython.noop),
+    ]
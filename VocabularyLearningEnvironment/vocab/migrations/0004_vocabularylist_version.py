@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0003_quizlist_question_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vocabularylist',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:17
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_learned_word_count(apps, schema_editor):
+    Member = apps.get_model("vocab", "Member")
+    UserMemory = apps.get_model("vocab", "UserMemory")
+    rows = UserMemory.objects.filter(user=OuterRef("pk")).order_by().values("user").annotate(n=Count("id")).values("n")
+    Member.objects.update(learned_word_count=Coalesce(Subquery(rows), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0004_vocabularylist_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='learned_word_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_learned_word_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0005_member_learned_word_count'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='usermemory',
+            name='is_asked_in_quiz',
+        ),
+        migrations.RemoveField(
+            model_name='vocabulary',
+            name='quiz_list',
+        ),
+    ]
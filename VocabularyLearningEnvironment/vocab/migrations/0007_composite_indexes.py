@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0006_quiz_state_on_quizlist'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizhistory',
+            index=models.Index(fields=['user', 'name', 'attempt'], name='vocab_quizh_user_id_85fa21_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vocabularylist',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['id', 'user'], name='vocablist_public_idx'),
+        ),
+    ]
@@ -1,19 +1,34 @@
 from django.db import models
 from django.utils import timezone
-from django.db.models import F, Q
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.contrib.auth.hashers import make_password, check_password
 from django.utils import timezone
 
 class Member(AbstractUser):
-    pass
+    # Number of UserMemory rows of the member. Kept in step by the code that
+    # saves or deletes memories (see release_learned_words) so quiz checks
+    # don't have to count them; recount_learned_words() repairs any drift.
+    learned_word_count = models.PositiveIntegerField(default=0)
     
 class VocabularyList(models.Model):
     list_name = models.CharField(max_length=100)
     description = models.CharField(max_length=200)
     user = models.ForeignKey(Member, on_delete=models.CASCADE, related_name="vocabulary_lists")
     is_public = models.BooleanField(default=False)
+    # Bumped whenever the deck's words change so cached indexes of the deck
+    # (vocab.deck_index) can tell they are stale.
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Partial index over public decks only, in id order: the catalog
+            # filters on a bare boolean, which a plain (is_public, ...) index
+            # can't serve on SQLite.
+            models.Index(fields=["id", "user"], condition=Q(is_public=True), name="vocablist_public_idx"),
+        ]
 
     def __str__(self):
         return "User:" + self.user.username + " - Deck:" + self.list_name
@@ -24,6 +39,12 @@ class QuizList(models.Model):
     score = models.IntegerField(default=0)
     question_count = models.IntegerField(default=0)
     asked_count = models.IntegerField(default=0)
+    # Shuffled Vocabulary ids, fixed when the quiz is created; `cursor` is the
+    # position of the first unanswered question. This is the whole quiz state:
+    # the questions before the cursor have been asked, so restarting or
+    # deleting a quiz touches this row only.
+    question_order = models.JSONField(default=list, blank=True)
+    cursor = models.PositiveIntegerField(default=0)
    
     def __str__(self):
         return f"{(self.name or '').strip()} {self.user.username}'s quiz"
@@ -41,7 +62,6 @@ class Vocabulary(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     vocabulary_list = models.ForeignKey(VocabularyList, on_delete=models.CASCADE, related_name="vocabularies")
-    quiz_list = models.ForeignKey(QuizList, on_delete=models.SET_NULL, related_name="quizzes", null=True, blank=True, default=None )
     
     def __str__(self):
         return self.source_word + "->" + self.target_word
@@ -66,7 +86,6 @@ class UserMemory(models.Model):
     last_occurrence = models.IntegerField(default=0)    
     alpha = models.FloatField(default=0.1)
     beta = models.FloatField(default=0.5)
-    is_asked_in_quiz = models.BooleanField(default=False)
 
     class Meta:
         unique_together = ("user", "vocabulary", "vocabulary_list")  
@@ -98,6 +117,10 @@ class StudySession(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # The user page lists a member's sessions newest first.
+        indexes = [models.Index(fields=["user", "created_at"])]
+
     def days_total(self):
         return (self.end_date - self.start_date).days + 1
 
@@ -173,7 +196,28 @@ class QuizHistory(models.Model):
     question_count = models.IntegerField(default=0)
     attempt = models.IntegerField(default=1)
     name = models.CharField(max_length = 200)
-    
-   
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "name", "attempt"])]
+
     def __str__(self):
-        return self.name + " - attempt:" + str(self.attempt) + " (User: " + self.user.username + ")"
\ No newline at end of file
+        return self.name + " - attempt:" + str(self.attempt) + " (User: " + self.user.username + ")"
+
+
+def release_learned_words(memories):
+    """Decrements learned_word_count for the owners of `memories`, a UserMemory
+    queryset that is about to be deleted (directly or by cascade)."""
+    counts = memories.values("user").annotate(n=models.Count("id")).values_list("user", "n")
+    for user_id, n in counts:
+        Member.objects.filter(pk=user_id).update(
+            learned_word_count=Greatest(F("learned_word_count") - n, 0)
+        )
+
+
+def recount_learned_words(members=None):
+    """Recomputes learned_word_count from UserMemory for `members` (a Member
+    queryset, default: everyone)."""
+    members = Member.objects.all() if members is None else members
+    rows = UserMemory.objects.filter(user=OuterRef("pk")).order_by().values("user").annotate(n=models.Count("id")).values("n")
+    members.update(learned_word_count=Coalesce(Subquery(rows), 0))
+
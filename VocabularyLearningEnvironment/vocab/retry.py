@@ -0,0 +1,55 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+# Messages of transient errors that are worth retrying.
+RETRYABLE_ERRORS = (
+    "database is locked",
+    "deadlock detected",
+    "could not serialize access",
+)
+
+
+class RetryPolicy:
+    """Retries a callable on transient database lock errors with exponential
+    backoff and jitter.
+
+    Calls made inside an outer atomic block are not retried: the surrounding
+    transaction is already broken, so only its owner can retry it.
+    """
+
+    def __init__(self, retries=5, delay=0.05, backoff=2.0, max_delay=1.0):
+        self.retries = retries
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_settings(cls):
+        conf = settings.DB_RETRY
+        return cls(
+            retries=conf["RETRIES"],
+            delay=conf["DELAY"],
+            backoff=conf["BACKOFF"],
+            max_delay=conf["MAX_DELAY"],
+        )
+
+    @staticmethod
+    def is_retryable(error):
+        message = str(error).lower()
+        return isinstance(error, OperationalError) and any(m in message for m in RETRYABLE_ERRORS)
+
+    def run(self, func, *args, **kwargs):
+        delay = self.delay
+        attempts = max(self.retries, 1)
+        for attempt in range(attempts):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                last_attempt = attempt == attempts - 1
+                if last_attempt or connection.in_atomic_block or not self.is_retryable(e):
+                    raise
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * self.backoff, self.max_delay)
@@ -1,3 +1,1137 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from components.learners.cache import LearnerCache
+from components.learners.exp_memory import ExpMemoryLearner
+from components.learners.population import ExpMemoryPopulation
+from components.simulation import run_teacher, simulate
+from components.sweep import expand_grid, run_sweep
+from components.teacher.base import Teacher
+from components.teacher.dictionary_store import DictionaryStore
+from components.teacher.items import WordItem
+from components.teacher.planners import LowestRecallPlanner, RandomPlanner
+from components.teacher.planning_contexts import FixedLearnerContext
+from components.teacher.translation import CachedTranslator, DictionaryTranslator, MyMemoryTranslator, TranslationCache
+
+from . import catalog, deck_io, views
+from .deck_index import bump_deck_version
+from .benchmarks import seed_dataset
+from .instrumentation import UNRESOLVED, QueryBudgetExceeded, full_table_scans, plan_problems, query_budget, view_stats
+from .models import (
+    Member, QuizHistory, QuizList, StudySession, UserAnswer, UserMemory, Vocabulary, VocabularyList,
+    recount_learned_words,
+)
+from .retry import RetryPolicy
+
+
+class VocabTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Member.objects.create_user(username="learner", password="pw-12345")
+        cls.deck = VocabularyList.objects.create(list_name="deck", description="", user=cls.user)
+        cls.vocabs = Vocabulary.objects.bulk_create(
+            [
+                Vocabulary(
+                    source_word=f"word{i}", target_word=f"wort{i}",
+                    source_language="en", target_language="de", vocabulary_list=cls.deck,
+                )
+                for i in range(50)
+            ]
+        )
+        UserMemory.objects.bulk_create(
+            [UserMemory(user=cls.user, vocabulary=v, vocabulary_list=cls.deck, n_occurrences=1) for v in cls.vocabs]
+        )
+        recount_learned_words()
+        end_date = timezone.localdate() + timedelta(days=7)
+        cls.deck_session = StudySession.objects.create(
+            user=cls.user, vocabulary_list=cls.deck, name="deck", goal_type="reviews_per_day",
+            goal_value=10, end_date=end_date,
+        )
+        cls.quiz_session = StudySession.objects.create(
+            user=cls.user, quiz_list=views.create_quiz_list(cls.user, 5), name="quiz", goal_type="quiz",
+            goal_value=5, end_date=end_date,
+        )
+
+    def setUp(self):
+        views.learner_cache.clear()
+        views.deck_indexes.clear()
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        # Unsaved reviews must not outlive the test database.
+        views.learner_cache.clear()
+
+
+@override_settings(ENFORCE_QUERY_BUDGETS=True)
+class QueryBudgetTests(VocabTestCase):
+    def test_deck_card_within_budget(self):
+        for _ in range(3):
+            response = self.client.get(reverse("random_word_by_id"), {"session_id": self.deck_session.id})
+            self.assertEqual(response.json()["status"], "ok")
+
+    def test_quiz_question_and_answer_within_budget(self):
+        data = self.client.get(reverse("random_word_by_id"), {"session_id": self.quiz_session.id}).json()
+        response = self.client.post(
+            reverse("submit_answer"),
+            {"question_id": data["question_id"], "given_answer": data["translation"], "session_id": self.quiz_session.id},
+        )
+        self.assertTrue(response.json()["is_correct"])
+
+    def test_answer_batch_within_budget(self):
+        question_order = self.quiz_session.quiz_list.question_order
+        quiz_words = [Vocabulary.objects.get(pk=pk) for pk in question_order]
+        answers = [{"question_id": v.id, "given_answer": v.target_word} for v in quiz_words[:4]]
+        answers += [{"question_id": quiz_words[4].id, "given_answer": "wrong"}, {"question_id": 0}]
+        response = self.client.post(
+            reverse("submit_answers"),
+            {"session_id": self.quiz_session.id, "answers": answers},
+            content_type="application/json",
+        )
+        data = response.json()
+        self.assertEqual(data["skipped"], [0])
+        self.assertEqual([r["is_correct"] for r in data["results"]], [True] * 4 + [False])
+        self.assertEqual(data["quizzes"][0]["score"], 4)
+        self.assertEqual(data["quizzes"][0]["asked_count"], 5)
+        self.assertTrue(data["quizzes"][0]["done"])
+        self.assertEqual(UserAnswer.objects.filter(quiz_list=self.quiz_session.quiz_list).count(), 5)
+
+    def test_prefetched_deck_cards_recorded_on_ack(self):
+        url = reverse("random_word_by_id")
+        data = self.client.get(url, {"session_id": self.deck_session.id, "prefetch": 5}).json()
+        self.assertTrue(data["ack_required"])
+        self.assertEqual(len(data["cards"]), 5)
+        learner = views.learner_cache.get(self.user)
+        before = sum(state.n_occurrences for state in learner.memory.values())
+
+        shown = [card["question_id"] for card in data["cards"][:3]]
+        response = self.client.post(
+            reverse("ack_cards"), {"session_id": self.deck_session.id, "question_id": shown + [0]}
+        )
+        self.assertEqual(response.json(), {"status": "ok", "recorded": 3, "pending": 2})
+        self.assertEqual(sum(state.n_occurrences for state in learner.memory.values()), before + 3)
+
+    def test_prefetched_quiz_cards_advance_on_answer(self):
+        url = reverse("random_word_by_id")
+        params = {"session_id": self.quiz_session.id, "prefetch": 3}
+        order = self.quiz_session.quiz_list.question_order
+        cards = self.client.get(url, params).json()["cards"]
+        self.assertEqual([card["question_id"] for card in cards], order[:3])
+        # Unanswered cards are served again rather than lost.
+        cards = self.client.get(url, params).json()["cards"]
+        self.assertEqual([card["question_id"] for card in cards], order[:3])
+
+        for card in cards[:2]:
+            self.client.post(
+                reverse("submit_answer"),
+                {"question_id": card["question_id"], "given_answer": card["translation"], "session_id": self.quiz_session.id},
+            )
+        cards = self.client.get(url, params).json()["cards"]
+        self.assertEqual([card["question_id"] for card in cards], order[2:5])
+
+        answers = [{"question_id": card["question_id"], "given_answer": "x"} for card in cards]
+        data = self.client.post(
+            reverse("submit_answers"),
+            {"session_id": self.quiz_session.id, "answers": answers},
+            content_type="application/json",
+        ).json()
+        self.assertEqual(data["quizzes"][0]["asked_count"], 5)
+        self.assertEqual(self.client.get(url, params).json()["status"], "done")
+        self.assertEqual(QuizHistory.objects.get(user=self.user, name="quiz").score, 2)
+
+    def test_quiz_answers_count_once_and_in_order(self):
+        order = self.quiz_session.quiz_list.question_order
+        answers = [{"question_id": order[2]}, {"question_id": order[2]}, {"question_id": order[0]}]
+        data = self.client.post(
+            reverse("submit_answers"),
+            {"session_id": self.quiz_session.id, "answers": answers},
+            content_type="application/json",
+        ).json()
+        # The first two questions are passed over; the repeat and the answer
+        # to an earlier question are stored but don't count.
+        self.assertEqual(data["quizzes"][0]["asked_count"], 3)
+        self.assertEqual(UserAnswer.objects.filter(quiz_list=self.quiz_session.quiz_list).count(), 1)
+        self.assertEqual(QuizList.objects.get(pk=self.quiz_session.quiz_list_id).cursor, 3)
+
+    def test_polling_endpoints_within_budget(self):
+        self.client.get(reverse("study_status"))
+        self.client.get(reverse("progress_check", args=[self.deck_session.id]))
+        self.client.get(reverse("quiz_status", args=[self.quiz_session.id]))
+
+    @override_settings(VIEW_QUERY_BUDGETS={"random_word_by_id": 1})
+    def test_exceeding_budget_fails(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse("random_word_by_id"), {"session_id": self.deck_session.id})
+
+    def test_query_budget_context_manager(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1):
+                list(Vocabulary.objects.all())
+                list(Member.objects.all())
+
+
+class InstrumentationStatsTests(VocabTestCase):
+    def test_stats_are_superuser_only(self):
+        response = self.client.get(reverse("instrumentation_stats"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_stats_aggregate_per_view(self):
+        view_stats.reset()
+        self.client.get(reverse("study_status"))
+        admin = Member.objects.create_superuser(username="admin", password="pw-12345")
+        self.client.force_login(admin)
+        stats = self.client.get(reverse("instrumentation_stats")).json()["views"]
+        self.assertEqual(stats["study_status"]["requests"], 1)
+        self.assertGreater(stats["study_status"]["avg_queries"], 0)
+
+    def test_unresolved_paths_share_one_key(self):
+        view_stats.reset()
+        for path in ("/no-such-page/", "/wp-login.php", "/.env"):
+            self.client.get(path)
+        self.assertEqual(view_stats.snapshot(), {UNRESOLVED: mock.ANY})
+        self.assertEqual(view_stats.snapshot()[UNRESOLVED]["requests"], 3)
+
+
+@override_settings(ENFORCE_QUERY_BUDGETS=True)
+class AsyncPollingTests(VocabTestCase):
+    async def test_polling_endpoints_over_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        view_stats.reset()
+
+        response = await self.async_client.get(reverse("study_status"))
+        self.assertEqual(response.json(), {"active": False})
+
+        response = await self.async_client.get(reverse("progress_check", args=[self.deck_session.id]))
+        self.assertEqual(response.json()["progress"], 0)
+
+        response = await self.async_client.get(reverse("quiz_status", args=[self.quiz_session.id]))
+        self.assertEqual(response.json()["total"], 5)
+
+        response = await self.async_client.post(reverse("study_update_time"))
+        self.assertEqual(response.json(), {"active": False})
+
+        self.assertGreater(view_stats.snapshot()["quiz_status"]["avg_queries"], 0)
+
+    @override_settings(STUDY_STREAM={"POLL_INTERVAL": 0, "KEEPALIVE": 15, "MAX_DURATION": 0.05, "RETRY_MS": 5000})
+    async def test_study_stream_pushes_changed_snapshots(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse("study_stream"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        chunks = [chunk.decode() async for chunk in response.streaming_content]
+
+        self.assertEqual(chunks[0], "retry: 5000\n\n")
+        events = [chunk for chunk in chunks if chunk.startswith("data: ")]
+        # The snapshot doesn't change, so it is sent only once.
+        self.assertEqual(len(events), 1)
+        snapshot = json.loads(events[0][len("data: "):])
+        self.assertEqual(snapshot["timer"], {"active": False})
+        self.assertEqual(snapshot["sessions"][str(self.quiz_session.id)]["quiz"]["total"], 5)
+        self.assertEqual(snapshot["sessions"][str(self.deck_session.id)]["progress"], 0)
+
+    def test_study_stream_is_refused_under_wsgi(self):
+        response = self.client.get(reverse("study_stream"))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+
+class DeckIndexTests(VocabTestCase):
+    def test_index_is_reused_until_the_deck_version_changes(self):
+        deck = VocabularyList.objects.get(pk=self.deck.pk)
+        index = views.deck_indexes.get(deck)
+        self.assertEqual(len(index), 50)
+        self.assertIs(views.deck_indexes.get(deck), index)
+
+        Vocabulary.objects.filter(vocabulary_list=deck).exclude(pk=self.vocabs[0].pk).delete()
+        bump_deck_version(deck.pk)
+        deck.refresh_from_db()
+        index = views.deck_indexes.get(deck)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.vocab_id(index[0]), self.vocabs[0].pk)
+
+
+class LearnedWordCountTests(VocabTestCase):
+    def test_counter_follows_saved_and_deleted_memories(self):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.learned_word_count, 50)
+
+        other = VocabularyList.objects.create(list_name="other", description="", user=self.user)
+        new_words = Vocabulary.objects.bulk_create(
+            [Vocabulary(source_word=f"neu{i}", target_word=f"new{i}", vocabulary_list=other) for i in range(3)]
+        )
+        for vocab in new_words + self.vocabs[:2]:
+            views.learner_cache.learn(self.user, WordItem(vocab.source_word, vocab.target_word), 100, vocab_id=vocab.id)
+        views.learner_cache.flush(self.user)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.learned_word_count, 53)
+
+        self.client.post(reverse("delete_list", args=[other.id]))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.learned_word_count, 50)
+
+
+    def test_admin_deletes_release_learned_words(self):
+        admin = Member.objects.create_superuser(username="admin", password="pw-12345")
+        self.client.force_login(admin)
+        memory = UserMemory.objects.filter(user=self.user).first()
+        self.client.post(reverse("admin:vocab_usermemory_delete", args=[memory.pk]), {"post": "yes"})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.learned_word_count, 49)
+
+        memories = UserMemory.objects.filter(user=self.user)[:4]
+        self.client.post(
+            reverse("admin:vocab_usermemory_changelist"),
+            {"action": "delete_selected", "_selected_action": [m.pk for m in memories], "post": "yes"},
+        )
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.learned_word_count, 45)
+
+        self.client.post(reverse("admin:vocab_vocabularylist_delete", args=[self.deck.pk]), {"post": "yes"})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.learned_word_count, 0)
+
+    def test_racing_inserts_count_once(self):
+        # word0 was stored by another process after this one looked; only the
+        # row actually inserted is counted, and word0 gets its review added.
+        other = VocabularyList.objects.create(list_name="other", description="", user=self.user)
+        fresh = Vocabulary.objects.create(source_word="neu", target_word="new", vocabulary_list=other)
+        learner = ExpMemoryLearner(0.1, 0.5)
+        learner.learn(WordItem("word0", "wort0"), 100, vocab_id=self.vocabs[0].id)
+        learner.learn(WordItem("neu", "new"), 100, vocab_id=fresh.id)
+        real_filter = UserMemory.objects.filter
+        checks = []
+
+        def filter(*args, **kwargs):
+            # The existence check before the insert (the first lookup) doesn't
+            # see word0 yet.
+            queryset = real_filter(*args, **kwargs)
+            if "vocabulary_id__in" in kwargs and not checks:
+                checks.append(kwargs)
+                return queryset.exclude(vocabulary_id=self.vocabs[0].id)
+            return queryset
+
+        with mock.patch.object(UserMemory.objects, "filter", side_effect=filter):
+            learner.save_memory_to_db(self.user)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.learned_word_count, 51)
+        self.assertEqual(UserMemory.objects.get(user=self.user, vocabulary=self.vocabs[0]).n_occurrences, 2)
+        self.assertTrue(UserMemory.objects.filter(user=self.user, vocabulary=fresh).exists())
+
+    def test_counter_refuses_large_quizzes_without_reading_memories(self):
+        with self.assertNumQueries(1), self.assertRaises(ValueError):
+            views.create_quiz_list(self.user, 51)
+
+    def test_quiz_session_needs_words_outside_live_quizzes(self):
+        # 50 words are learned, but 5 of them are in the live quiz session.
+        response = self.client.post(reverse("user_page"), {
+            "form_type": "create_session", "name": "too big", "goal_type": "quiz", "goal_value": 48,
+            "start_date": timezone.localdate(), "end_date": self.quiz_session.end_date,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("goal_value", response.context["session_form"].errors)
+        self.assertFalse(StudySession.objects.filter(name="too big").exists())
+
+
+class LearnerCacheTests(VocabTestCase):
+    def learn(self, learner_cache, user, vocab):
+        learner_cache.learn(user, WordItem(vocab.source_word, vocab.target_word), 100, vocab_id=vocab.id)
+
+    def test_processes_add_their_reviews(self):
+        first, second = LearnerCache(flush_interval=3600), LearnerCache(flush_interval=3600)
+        first.get(self.user)
+        second.get(self.user)
+        self.learn(first, self.user, self.vocabs[0])
+        self.learn(second, self.user, self.vocabs[0])
+        first.flush(self.user)
+        second.flush(self.user)
+
+        memory = UserMemory.objects.get(user=self.user, vocabulary=self.vocabs[0])
+        self.assertEqual(memory.n_occurrences, 3)
+        self.assertEqual(second.get(self.user).memory["word0"].n_occurrences, 3)
+
+    def test_learn_flushes_due_users_only(self):
+        second = Member.objects.create_user(username="second", password="pw-12345")
+        third = Member.objects.create_user(username="third", password="pw-12345")
+        learner_cache = LearnerCache(flush_interval=60)
+        with mock.patch("components.learners.cache._time.monotonic", return_value=1000.0):
+            for user in (self.user, second, third):
+                self.learn(learner_cache, user, self.vocabs[1])
+        with mock.patch("components.learners.cache._time.monotonic", return_value=1061.0):
+            self.learn(learner_cache, third, self.vocabs[2])
+
+        # The learning user and the least recently used one are written back.
+        self.assertEqual(UserMemory.objects.get(user=self.user, vocabulary=self.vocabs[1]).n_occurrences, 2)
+        self.assertEqual(UserMemory.objects.filter(user=third).count(), 2)
+        self.assertFalse(UserMemory.objects.filter(user=second).exists())
+        learner_cache.clear()
+
+    def test_idle_users_are_flushed(self):
+        second = Member.objects.create_user(username="second", password="pw-12345")
+        learner_cache = LearnerCache(flush_interval=60)
+        with mock.patch("components.learners.cache._time.monotonic", return_value=1000.0):
+            self.learn(learner_cache, self.user, self.vocabs[1])
+        with mock.patch("components.learners.cache._time.monotonic", return_value=1050.0):
+            self.learn(learner_cache, second, self.vocabs[1])
+        with mock.patch("components.learners.cache._time.monotonic", return_value=1061.0):
+            learner_cache.flush_idle()
+
+        self.assertEqual(UserMemory.objects.get(user=self.user, vocabulary=self.vocabs[1]).n_occurrences, 2)
+        self.assertFalse(UserMemory.objects.filter(user=second).exists())
+
+        # close() writes back everyone else.
+        learner_cache.close()
+        self.assertTrue(UserMemory.objects.filter(user=second).exists())
+
+    def test_background_flusher(self):
+        learner_cache = LearnerCache(flush_interval=0.01, background_flush=True)
+        ran = threading.Event()
+        with mock.patch.object(learner_cache, "flush_idle", side_effect=ran.set), \
+                mock.patch.object(learner_cache, "flush"):
+            self.learn(learner_cache, self.user, self.vocabs[1])
+            self.assertTrue(ran.wait(5))
+            learner_cache.close()
+        self.assertIsNone(learner_cache._flusher)
+        learner_cache.clear()
+
+    def test_ending_a_review_session_flushes(self):
+        views.learner_cache.learn(self.user, WordItem("word3", "wort3"), 100, vocab_id=self.vocabs[3].id)
+        self.client.post(reverse("study_end"))
+        self.assertEqual(UserMemory.objects.get(user=self.user, vocabulary=self.vocabs[3]).n_occurrences, 2)
+
+
+class QuizStateTests(VocabTestCase):
+    def test_restart_rewinds_the_quiz_row_only(self):
+        url = reverse("random_word_by_id")
+        params = {"session_id": self.quiz_session.id, "prefetch": 5}
+        first = [card["question_id"] for card in self.client.get(url, params).json()["cards"]]
+        self.client.post(
+            reverse("submit_answers"),
+            {"session_id": self.quiz_session.id, "answers": [{"question_id": pk} for pk in first[:3]]},
+            content_type="application/json",
+        )
+
+        with self.assertNumQueries(7):
+            response = self.client.post(reverse("restart_quiz", args=[self.quiz_session.id]))
+        self.assertEqual(response.json()["question_count"], 5)
+        again = [card["question_id"] for card in self.client.get(url, params).json()["cards"]]
+        self.assertEqual(sorted(again), sorted(first))
+
+    def test_new_quiz_leaves_out_words_of_live_quizzes(self):
+        quiz = views.create_quiz_list(self.user, 45)
+        self.assertFalse(set(quiz.question_order) & set(self.quiz_session.quiz_list.question_order))
+        StudySession.objects.create(
+            user=self.user, quiz_list=quiz, name="quiz 2", goal_type="quiz", goal_value=45,
+            end_date=self.quiz_session.end_date,
+        )
+        with self.assertRaises(ValueError):
+            views.create_quiz_list(self.user, 1)
+
+
+class QueryPlanTests(TestCase):
+    """EXPLAINs the queries the hot views and catalog pages actually send
+    against a seeded dataset, and fails when one of them would read a whole
+    table or index, or sort outside an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # More members than fit on a catalog page, or ANALYZE makes reading
+        # all of vocab_member look cheaper than looking the page's owners up.
+        seed_dataset(users=100, decks=2, words=20, learned=0.5, seed=1)
+        cls.user = Member.objects.first()
+        cls.deck = VocabularyList.objects.filter(user=cls.user).first()
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+
+    def tearDown(self):
+        # Unsaved reviews must not outlive the test database.
+        views.learner_cache.clear()
+
+    def capture(self, func):
+        """(sql, params) of the reads and writes `func` sends to the database."""
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            if not many and sql.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE"):
+                statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            func()
+        return statements
+
+    def hot_paths(self):
+        user = self.user
+        deck_session = StudySession.objects.get(user=user, quiz_list__isnull=True)
+        quiz_session = StudySession.objects.get(user=user, quiz_list__isnull=False)
+        _, cursor = catalog._load_page(0, 5)
+        get = self.client.get
+        return {
+            "public deck page": lambda: catalog._load_page(0, 25),
+            "next public deck page": lambda: catalog._load_page(cursor, 25),
+            "catalog view": lambda: (cache.clear(), get(reverse("get_public_decks"))),
+            "user page": lambda: get(reverse("user_page")),
+            "deck cards": lambda: get(reverse("random_word_by_id"), {"session_id": deck_session.id}),
+            "quiz cards": lambda: get(reverse("random_word_by_id"), {"session_id": quiz_session.id}),
+            "study status": lambda: get(reverse("study_status")),
+            "progress": lambda: get(reverse("progress_check", args=[deck_session.id])),
+            "quiz status": lambda: get(reverse("quiz_status", args=[quiz_session.id])),
+        }
+
+    def test_hot_queries_use_indexes(self):
+        self.client.force_login(self.user)
+        for name, func in self.hot_paths().items():
+            statements = self.capture(func)
+            self.assertTrue(statements, name)
+            for sql, params in statements:
+                with self.subTest(name, sql=sql):
+                    self.assertEqual(plan_problems(sql, params), [])
+
+    def test_full_scan_is_detected(self):
+        self.assertIn("vocab_vocabulary", full_table_scans(Vocabulary.objects.filter(target_word="wort1")))
+
+    def test_temp_sort_is_detected(self):
+        self.assertIn(
+            "TEMP B-TREE FOR ORDER BY", full_table_scans(Vocabulary.objects.filter(vocabulary_list=self.deck).order_by("target_word"))
+        )
+
+
+@override_settings(PUBLIC_DECKS={"PAGE_SIZE": 2, "MAX_PAGE_SIZE": 10, "CACHE_TIMEOUT": 60, "CACHE_ALIAS": "default"})
+class PublicDeckCatalogTests(VocabTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.author = Member.objects.create_user(username="author", password="pw-12345")
+        cls.public = VocabularyList.objects.bulk_create(
+            [VocabularyList(list_name=f"public {i}", description="", user=cls.author, is_public=True) for i in range(5)]
+        )
+        Vocabulary.objects.bulk_create(
+            [Vocabulary(source_word=f"w{i}", target_word=f"t{i}", vocabulary_list=cls.public[0]) for i in range(3)]
+        )
+
+    def test_pages_follow_the_cursor(self):
+        url = reverse("get_public_decks")
+        seen, after = [], 0
+        while after is not None:
+            # Session and user lookups, then the page ids and their details.
+            with self.assertNumQueries(4):
+                data = self.client.get(url, {"after": after}).json()
+            seen += [deck["list_name"] for deck in data["decks"]]
+            after = data["next_cursor"]
+        self.assertEqual(seen, [f"public {i}" for i in range(5)])
+        self.assertEqual(self.client.get(url, {"limit": 1}).json()["decks"][0]["word_count"], 3)
+
+    def test_cached_pages_are_invalidated_by_privacy_changes(self):
+        url = reverse("get_public_decks")
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+        self.client.post(reverse("reverse_privacy", args=[self.deck.id]))
+        names = [deck["list_name"] for deck in Client().get(url, {"limit": 10}).json()["decks"]]
+        self.assertEqual(names, ["deck"] + [f"public {i}" for i in range(5)])
+        # The owner doesn't see their own deck in the catalog.
+        self.assertNotIn("deck", [deck["list_name"] for deck in self.client.get(url, {"limit": 10}).json()["decks"]])
+
+    def test_session_form_lists_own_decks_and_the_first_page(self):
+        form = self.client.get(reverse("user_page")).context["session_form"]
+        choices = list(form.fields["vocabulary_list"].widget.choices)
+        self.assertEqual(choices[1:], [
+            (self.deck.id, "deck"),
+            ("Public decks", [(self.public[0].id, "public 0 (author)"), (self.public[1].id, "public 1 (author)")]),
+        ])
+
+    def test_session_form_accepts_public_decks_past_the_first_page(self):
+        private = VocabularyList.objects.create(list_name="private", description="", user=self.author)
+        data = {
+            "form_type": "create_session", "name": "later", "goal_type": "reviews_per_day", "goal_value": 5,
+            "start_date": "2024-01-01", "end_date": "2024-02-01",
+        }
+        self.client.post(reverse("user_page"), {**data, "vocabulary_list": self.public[4].id})
+        self.assertTrue(StudySession.objects.filter(name="later", vocabulary_list=self.public[4]).exists())
+
+        response = self.client.post(reverse("user_page"), {**data, "name": "theirs", "vocabulary_list": private.id})
+        self.assertIn("vocabulary_list", response.context["session_form"].errors)
+        self.assertFalse(StudySession.objects.filter(name="theirs").exists())
+
+
+class CreateListTests(VocabTestCase):
+    def generated(self, count):
+        items = [WordItem(f"new{i}", f"neu{i}") for i in range(count)]
+        return mock.patch.object(views.planner, "load_chosen_words", return_value=items)
+
+    def test_words_are_inserted_in_one_statement(self):
+        # Session and user, then the savepoint, the deck, one bulk insert and
+        # the release.
+        with self.generated(20), self.assertNumQueries(6) as captured:
+            self.client.post(reverse("create_list", args=[20]), {"list_name": "generated", "description": ""})
+        inserts = [q["sql"] for q in captured.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 2)
+        self.assertIn('"vocab_vocabularylist"', inserts[0])
+        self.assertIn('"vocab_vocabulary"', inserts[1])
+        self.assertEqual(VocabularyList.objects.get(list_name="generated").vocabularies.count(), 20)
+
+    def test_failed_insert_leaves_no_deck(self):
+        with self.generated(5), mock.patch.object(Vocabulary.objects, "bulk_create", side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.client.post(reverse("create_list", args=[5]), {"list_name": "half built", "description": ""})
+        self.assertFalse(VocabularyList.objects.filter(list_name="half built").exists())
+
+
+class DeckImportExportTests(VocabTestCase):
+    SAMPLES = {
+        "csv": "source,target\nhouse,Haus\n\"a, b\",\"c\"\nbroken\n",
+        "tsv": "house\tHaus\na, b\tc\nbroken\n",
+        "jsonl": '{"source": "house", "target": "Haus"}\n{"source": "a, b", "target": "c"}\nnot json\n',
+        "anki": "#separator:tab\n#html:true\n<b>house</b>\tHaus\ttag\na, b\tc\nbroken\n",
+    }
+
+    def test_formats_round_trip(self):
+        for fmt, text in self.SAMPLES.items():
+            with self.subTest(fmt):
+                result = deck_io.import_deck(self.user, io.StringIO(text, newline=""), fmt, name=fmt, batch_size=1)
+                self.assertEqual((result.imported, result.skipped), (2, 1))
+
+                exported = "".join(deck_io.export_deck(result.deck, fmt))
+                again = deck_io.import_deck(self.user, io.StringIO(exported, newline=""), fmt, name=fmt)
+                words = Vocabulary.objects.filter(vocabulary_list=again.deck).order_by("id")
+                self.assertEqual(
+                    list(words.values_list("source_word", "target_word")), [("house", "Haus"), ("a, b", "c")]
+                )
+
+    def test_appending_bumps_the_deck_version(self):
+        deck_io.import_deck(self.user, ["x,y\n"], "csv", deck=self.deck)
+        self.deck.refresh_from_db()
+        self.assertEqual(self.deck.version, 1)
+        self.assertEqual(Vocabulary.objects.filter(vocabulary_list=self.deck).count(), 51)
+
+    def test_upload_and_download(self):
+        upload = SimpleUploadedFile("animals.tsv", "cat\tKatze\ndog\tHund\n".encode())
+        self.client.post(reverse("import_list"), {"file": upload})
+        deck = VocabularyList.objects.get(user=self.user, list_name="animals")
+        self.assertEqual(deck.vocabularies.count(), 2)
+
+        response = self.client.get(reverse("export_list", args=[deck.id]), {"format": "jsonl"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["target"] for line in lines], ["Katze", "Hund"])
+
+        stranger = Member.objects.create_user(username="stranger", password="pw-12345")
+        self.client.force_login(stranger)
+        self.assertEqual(self.client.get(reverse("export_list", args=[deck.id])).status_code, 404)
+
+    def test_nul_bytes_are_dropped(self):
+        result = deck_io.import_deck(self.user, ["ca\0t,Kat\0ze\n"], "csv", name="nul")
+        self.assertEqual(list(result.deck.vocabularies.values_list("source_word", "target_word")), [("cat", "Katze")])
+        result = deck_io.import_deck(self.user, ['{"source": "dog\\u0000", "target": "Hund"}\n'], "jsonl", name="nul")
+        self.assertEqual(result.deck.vocabularies.get().source_word, "dog")
+
+    def test_failed_import_removes_the_new_deck(self):
+        lines = ["a,b\n"] * 5 + ['"' + "x" * 200_000 + '",y\n']
+        with self.assertRaises(deck_io.DeckImportError):
+            deck_io.import_deck(self.user, lines, "csv", name="broken", batch_size=2)
+        self.assertFalse(VocabularyList.objects.filter(list_name="broken").exists())
+
+        # Batches already appended to an existing deck stay, and readers of
+        # the deck see its new version.
+        with self.assertRaises(deck_io.DeckImportError):
+            deck_io.import_deck(self.user, lines, "csv", deck=self.deck, batch_size=2)
+        self.deck.refresh_from_db()
+        self.assertEqual((self.deck.vocabularies.count(), self.deck.version), (54, 1))
+
+    def test_public_deck_is_published_after_its_rows(self):
+        result = deck_io.import_deck(self.user, ["a,b\n", "c,d\n"], "csv", name="shared", is_public=True)
+        self.assertTrue(VocabularyList.objects.get(pk=result.deck.pk).is_public)
+        with self.assertRaises(deck_io.DeckImportError):
+            deck_io.import_deck(self.user, ["a,b\n", "c,d\n", "e,f\n"], "csv", name="capped", max_rows=2)
+        self.assertFalse(VocabularyList.objects.filter(list_name="capped").exists())
+
+    @override_settings(DECK_IMPORT={"MAX_UPLOAD_BYTES": 300_000, "MAX_ROWS": 3})
+    def test_bad_uploads_are_refused(self):
+        uploads = {
+            "oversized field": SimpleUploadedFile("big.csv", b'"' + b"x" * 200_000 + b'",y\n'),
+            "too large": SimpleUploadedFile("large.csv", b"a,b\n" * 100_000),
+            "too many rows": SimpleUploadedFile("long.csv", b"a,b\n" * 4),
+        }
+        for name, upload in uploads.items():
+            with self.subTest(name):
+                response = self.client.post(reverse("import_list"), {"file": upload}, follow=True)
+                self.assertRedirects(response, reverse("user_page"))
+                [message] = response.context["messages"]
+                self.assertEqual(message.level_tag, "error")
+
+                upload.seek(0)
+                response = self.client.post(reverse("import_list"), {"file": upload}, HTTP_ACCEPT="application/json")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["status"], "error")
+        self.assertEqual(VocabularyList.objects.filter(user=self.user).count(), 1)
+
+
+
+class RecallProbabilityTests(SimpleTestCase):
+    def setUp(self):
+        self.material = [WordItem(f"word{i}", f"wort{i}") for i in range(12)]
+        self.learner = ExpMemoryLearner(alpha=0.2, beta=0.3)
+        for i, item in enumerate(self.material[:8]):
+            for t in range(i % 3 + 1):
+                self.learner.learn(item, i * 2 + t)
+
+    def scalar(self, questions, time):
+        return [
+            self.learner.memory[q].get_probability(time) if q in self.learner.memory else 0.0 for q in questions
+        ]
+
+    def test_matches_scalar_probabilities(self):
+        questions = self.learner.arrays.questions
+        np.testing.assert_allclose(self.learner.get_probabilities(30), self.scalar(questions, 30))
+
+    def test_subset_with_unknown_questions(self):
+        questions = ["word9", "word3", "nope", "word0", "word11"]
+        probabilities = self.learner.get_probabilities(30, questions)
+        np.testing.assert_allclose(probabilities, self.scalar(questions, 30))
+        self.assertEqual((probabilities[0], probabilities[2]), (0.0, 0.0))
+
+    def test_after_swap_remove(self):
+        # Forgetting word2 moves the last slot (word7) into its place.
+        self.learner.forget("word2")
+        self.assertEqual(self.learner.arrays.questions[2], "word7")
+        questions = self.learner.arrays.questions
+        np.testing.assert_allclose(self.learner.get_probabilities(30), self.scalar(questions, 30))
+        subset = ["word7", "word2", "word6"]
+        np.testing.assert_allclose(self.learner.get_probabilities(30, subset), self.scalar(subset, 30))
+
+    def test_teacher_run_retention(self):
+        learner = ExpMemoryLearner(alpha=0.2, beta=0.3)
+        teacher = Teacher(self.material, LowestRecallPlanner(0.5), FixedLearnerContext(ExpMemoryLearner(0.2, 0.3)))
+        result = run_teacher(teacher, learner, horizon=40, eval_every=10)
+        self.assertEqual(result.times, [10, 20, 30, 40])
+        questions = [item.get_question() for item in self.material]
+        expected = np.mean([
+            learner.memory[q].get_probability(40) if q in learner.memory else 0.0 for q in questions
+        ])
+        self.assertAlmostEqual(result.final_retention, expected)
+
+
+class LowestRecallPlannerTests(SimpleTestCase):
+    threshold = 0.5
+
+    def setUp(self):
+        self.material = [WordItem(f"word{i}", f"wort{i}") for i in range(30)]
+        self.learner = ExpMemoryLearner(alpha=0.2, beta=0.3)
+        for i, item in enumerate(self.material[:20]):
+            for t in range(i % 4 + 1):
+                self.learner.learn(item, i * 3 + t)
+        self.context = FixedLearnerContext(self.learner)
+        self.planner = LowestRecallPlanner(self.threshold)
+
+    def linear_due(self, time):
+        # Reference rule, rescoring the whole material on every call: the
+        # earliest due seen item if it is due or nothing is unseen, else the
+        # first unseen item.
+        seen = [
+            (self.learner.memory[item.get_question()].get_due_time(self.threshold), item)
+            for item in self.material if item.get_question() in self.learner.memory
+        ]
+        unseen = [item for item in self.material if item.get_question() not in self.learner.memory]
+        earliest = min(seen, key=lambda pair: pair[0], default=None)
+        if earliest is not None and (earliest[0] <= time or not unseen):
+            return earliest[0]
+        return unseen[0]
+
+    def chosen_due(self, item):
+        state = self.learner.memory.get(item.get_question())
+        return item if state is None else state.get_due_time(self.threshold)
+
+    def test_matches_linear_scan(self):
+        for time in (0, 40, 60, 80, 200, 10_000):
+            chosen = self.planner.choose_item(self.material, self.context, time)
+            self.assertEqual(self.chosen_due(chosen), self.linear_due(time))
+
+    def test_update_keeps_order_after_learn(self):
+        for time in range(60, 260, 2):
+            chosen = self.planner.choose_item(self.material, self.context, time)
+            self.assertEqual(self.chosen_due(chosen), self.linear_due(time))
+            self.context.update(chosen, chosen.get_answer(), time)
+            self.planner.update(chosen, chosen.get_answer(), self.context, time)
+        self.assertGreater(len(self.learner.memory), 20)
+
+
+class SimulationTests(SimpleTestCase):
+    def test_batch_choice_matches_teacher(self):
+        # A single-learner population with the same history as the Teacher's
+        # learner must be asked the same item at every step.
+        material = [WordItem(f"word{i}", f"wort{i}") for i in range(15)]
+        teacher = Teacher(material, LowestRecallPlanner(0.5), FixedLearnerContext(ExpMemoryLearner(0.2, 0.3)))
+        batch_planner = LowestRecallPlanner(0.5)
+        population = ExpMemoryPopulation(1, len(material), alpha=0.2, beta=0.3)
+        rng = np.random.default_rng(0)
+        for t in range(0, 300, 3):
+            item = teacher.choose_item(t)
+            chosen = batch_planner.choose_batch(population, t, rng)
+            self.assertIs(material[chosen[0]], item, f"step {t}")
+            teacher.gets_answer(item, None, t)
+            population.learn(chosen, t)
+
+    def test_simulate_is_deterministic(self):
+        def run(seed):
+            return simulate(LowestRecallPlanner(0.5), n_items=20, n_learners=50, horizon=30, seed=seed, eval_every=10)
+
+        first, again = run(3), run(3)
+        self.assertEqual(first.times, [10, 20, 30])
+        self.assertEqual((first.retention, first.accuracy), (again.retention, again.accuracy))
+        self.assertNotEqual(first.accuracy, run(4).accuracy)
+
+    def test_simulate_retention(self):
+        # With one item it is asked every step: after step t it has been seen
+        # t + 1 times, the last time at t.
+        result = simulate(LowestRecallPlanner(0.5), n_items=1, n_learners=3, horizon=5, alpha=0.2, beta=0.3)
+        expected = [np.exp(-0.2 * 0.7 ** (t + 1)) for t in range(5)]
+        np.testing.assert_allclose(result.retention, expected)
+        self.assertEqual(result.accuracy[0], 0.0)
+
+
+class SweepTests(SimpleTestCase):
+    TIMINGS = ("steps_per_second", "elapsed")
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.tasks = expand_grid(["lowest_recall", "random"], [0.1, 0.3], [0.5], [20], base_seed=7)
+
+    def results(self, rows):
+        return sorted(tuple(v for k, v in row.items() if k not in self.TIMINGS) for row in rows)
+
+    def test_rows_do_not_depend_on_runs_or_workers(self):
+        self.assertEqual(self.tasks, expand_grid(["lowest_recall", "random"], [0.1, 0.3], [0.5], [20], base_seed=7))
+        self.assertEqual(len({task["seed"] for task in self.tasks}), 4)
+
+        runs = [
+            run_sweep(self.tasks, os.path.join(self.dir, f"{workers}.csv"), n_learners=20, n_items=10, max_workers=workers)
+            for workers in (1, 2, 2)
+        ]
+        self.assertEqual(self.results(runs[0]), self.results(runs[1]))
+        self.assertEqual(self.results(runs[1]), self.results(runs[2]))
+
+        with open(os.path.join(self.dir, "2.csv"), newline="") as f:
+            self.assertEqual(sorted(int(row["task"]) for row in csv.DictReader(f)), [0, 1, 2, 3])
+
+    def test_rows_are_written_as_tasks_finish(self):
+        # Each task after the first waits until the previous row is on disk.
+        path = os.path.join(self.dir, "sweep.csv")
+
+        def run_task(task, *args):
+            if task["task"]:
+                deadline = time.monotonic() + 5
+                while True:
+                    with open(path, newline="") as f:
+                        if len(f.readlines()) >= task["task"] + 1:
+                            break
+                    self.assertLess(time.monotonic(), deadline, "earlier rows were not written")
+                    time.sleep(0.01)
+            return {**task, "final_retention": 0.0}
+
+        with mock.patch("components.sweep.ProcessPoolExecutor", ThreadPoolExecutor), \
+                mock.patch("components.sweep.run_task", side_effect=run_task):
+            rows = run_sweep(self.tasks, path, n_learners=1, n_items=1, max_workers=1)
+        self.assertEqual([row["task"] for row in rows], [0, 1, 2, 3])
+
+    def test_command(self):
+        path = os.path.join(self.dir, "out.csv")
+        out = io.StringIO()
+        call_command(
+            "sweep_planners", "--planners", "lowest_recall", "--alphas", "0.1", "0.2", "--horizons", "10",
+            "--learners", "10", "--items", "5", "--workers", "1", "--output", path, stdout=out,
+        )
+        self.assertIn("Wrote 2 rows", out.getvalue())
+        with open(path, newline="") as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 2)
+
+
+class TranslationCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.data_dir = tmp.name
+        self.now = 1_000_000.0
+        clock = mock.patch("components.teacher.translation.time.time", side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def make_cache(self, **kwargs):
+        return TranslationCache(os.path.join(self.data_dir, "cache.sqlite3"), **kwargs)
+
+    def test_default_path_in_data_dir(self):
+        with override_settings(DATA_DIR=os.path.join(self.data_dir, "var")):
+            cache_ = TranslationCache()
+            cache_.set_many({"house": "Haus"}, "en", "de")
+        self.assertTrue(os.path.exists(os.path.join(self.data_dir, "var", TranslationCache.FILENAME)))
+
+    def test_entries_expire_after_ttl(self):
+        cache_ = self.make_cache(ttl=60)
+        cache_.set_many({"house": "Haus"}, "en", "de")
+        self.now += 59
+        self.assertEqual(cache_.get_many(["house"], "en", "de"), {"house": "Haus"})
+        self.now += 2
+        self.assertEqual(cache_.get_many(["house"], "en", "de"), {})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache_ = self.make_cache(max_entries=2)
+        cache_.set_many({"house": "Haus"}, "en", "de")
+        self.now += 1
+        cache_.set_many({"tree": "Baum"}, "en", "de")
+        self.now += 1
+        cache_.get_many(["house"], "en", "de")
+        self.now += 1
+        cache_.set_many({"dog": "Hund"}, "en", "de")
+        self.assertEqual(
+            cache_.get_many(["house", "tree", "dog"], "en", "de"), {"house": "Haus", "dog": "Hund"}
+        )
+
+
+class FakeTranslationServer(ThreadingHTTPServer):
+    """Local stand-in for the MyMemory API: translates "x" to "x-de" after
+    `delays.get(x, 0)` seconds."""
+
+    daemon_threads = True
+
+    def __init__(self, delays=None):
+        super().__init__(("127.0.0.1", 0), _FakeTranslationHandler)
+        self.delays = delays or {}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/get"
+
+
+class _FakeTranslationHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        word = parse_qs(urlparse(self.path).query)["q"][0]
+        time.sleep(self.server.delays.get(word, 0))
+        body = json.dumps({"responseData": {"translatedText": f"{word}-de"}}).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            # The client gave up on this word.
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class TranslatePipelineTests(SimpleTestCase):
+    """Pipeline tests against the offline DictionaryTranslator backend."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = TranslationCache(os.path.join(tmp.name, "cache.sqlite3"))
+        self.backend = DictionaryTranslator({f"word{i}": f"wort{i}" for i in range(7)} | {"tree": "Baum"})
+        self.translator = CachedTranslator(self.backend, self.cache)
+
+    def make_planner(self, **kwargs):
+        return RandomPlanner(translator=self.translator, use_json=False, **kwargs)
+
+    def test_translates_batches(self):
+        words = [f"word{i}" for i in range(7)]
+        items = self.make_planner(batch_size=3)._translate_pipeline(iter(words), 5)
+        # Batches finish in any order.
+        self.assertCountEqual([(i.source, i.target) for i in items], [(w, w.replace("word", "wort")) for w in words[:5]])
+
+    def test_unknown_words_are_replaced(self):
+        words = ["word0", "missing", "word1", "unknown", "word2"]
+        items = self.make_planner(batch_size=2)._translate_pipeline(iter(words), 3)
+        self.assertCountEqual([i.source for i in items], ["word0", "word1", "word2"])
+        self.assertEqual(self.backend.translate("word0", "en", "fr"), "")
+
+    def test_cache_hits_skip_the_backend(self):
+        self.cache.set_many({"house": "Haus"}, "en", "de")
+        with mock.patch.object(self.backend, "translate_many", wraps=self.backend.translate_many) as fetch:
+            items = self.make_planner()._translate_pipeline(iter(["house", "tree"]), 2)
+            self.assertEqual([(i.source, i.target) for i in items], [("house", "Haus"), ("tree", "Baum")])
+            self.assertEqual(fetch.call_args.args[0], ["tree"])
+
+            self.make_planner()._translate_pipeline(iter(["house", "tree"]), 2)
+            self.assertEqual(fetch.call_count, 1)
+
+
+class TranslateDeadlineTests(SimpleTestCase):
+    """Deadline tests against a local HTTP stand-in for MyMemory, so the
+    timeouts reach real requests."""
+
+    def setUp(self):
+        self.server = FakeTranslationServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = TranslationCache(os.path.join(tmp.name, "cache.sqlite3"))
+        self.translator = CachedTranslator(MyMemoryTranslator(self.server.url), self.cache)
+
+    def make_planner(self, **kwargs):
+        return RandomPlanner(translator=self.translator, use_json=False, **kwargs)
+
+    def test_deadline_bounds_slow_batches(self):
+        self.server.delays = {"slow1": 5, "slow2": 5}
+        planner = self.make_planner(batch_size=2, batch_timeout=0.3)
+        # Idle workers of other tests' pools may still be exiting.
+        before = set(threading.enumerate())
+        started = time.monotonic()
+        items = planner._translate_pipeline(iter(["slow1", "slow2", "fast"]), 2)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual([i.source for i in items], ["fast"])
+
+        # The deadline reaches the worker's request, not only the planner's
+        # wait, so no translation thread is left running.
+        time.sleep(planner.DEADLINE_GRACE)
+        self.assertFalse([
+            t for t in set(threading.enumerate()) - before if t.name.startswith("ThreadPoolExecutor")
+        ])
+
+    def test_partial_batch_is_used_and_cached(self):
+        self.server.delays = {"slow": 5}
+        items = self.make_planner(batch_size=4, batch_timeout=0.5)._translate_pipeline(
+            iter(["house", "tree", "slow", "dog", "cat"]), 4
+        )
+        self.assertCountEqual([i.source for i in items], ["house", "tree", "cat"])
+        self.assertEqual(
+            self.cache.get_many(["house", "tree", "slow", "dog"], "en", "de"), {"house": "house-de", "tree": "tree-de"}
+        )
+
+
+class DictionaryStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.json_path = os.path.join(self.dir, "dictionary.json")
+        self.write_json({f"word{i}": f"wort{i}" for i in range(40)})
+
+    def write_json(self, entries, mtime=None):
+        with open(self.json_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        if mtime is not None:
+            os.utime(self.json_path, (mtime, mtime))
+
+    def make_store(self):
+        return DictionaryStore(os.path.join(self.dir, "store.sqlite3"), self.json_path)
+
+    def test_default_path_in_data_dir(self):
+        with override_settings(DATA_DIR=os.path.join(self.dir, "var")):
+            self.assertEqual(DictionaryStore(json_path=self.json_path).count(), 40)
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "var", DictionaryStore.FILENAME)))
+
+    def test_sample(self):
+        store = self.make_store()
+        rng = random.Random(7)
+        sample = store.sample(10, rng=rng)
+        self.assertEqual(len(sample), 10)
+        self.assertEqual(len(set(sample)), 10)
+        self.assertTrue(all(target == "wort" + source[4:] for source, target in sample))
+
+        excluded = {f"word{i}" for i in range(0, 40, 2)}
+        sample = store.sample(40, exclude=lambda words: excluded & set(words), rng=rng)
+        self.assertCountEqual([source for source, _ in sample], {f"word{i}" for i in range(40)} - excluded)
+
+        top = {source for source, _ in store.sample(40, max_rank=5, rng=rng)}
+        self.assertEqual(len(top), 5)
+        self.assertTrue(all(store.lookup(source) for source in top))
+
+    def test_rebuilds_when_json_is_newer(self):
+        store = self.make_store()
+        self.assertEqual(store.count(), 40)
+        french = DictionaryStore(store.path, json_path=None, tgt="fr")
+        french.build([("house", "maison")])
+
+        self.write_json({"house": "Haus", "tree": "Baum"}, mtime=time.time() + 10)
+        store = self.make_store()
+        self.assertEqual(store.count(), 2)
+        self.assertEqual(store.lookup("tree"), "Baum")
+        # Other language pairs survive the rebuild.
+        self.assertEqual(DictionaryStore(store.path, json_path=None, tgt="fr").lookup("house"), "maison")
+
+    def test_broken_json_is_logged(self):
+        with open(self.json_path, "w", encoding="utf-8") as f:
+            f.write("{not json")
+        store = self.make_store()
+        with self.assertLogs("components.teacher.dictionary_store", "ERROR"):
+            self.assertEqual(store.count(), 0)
+        self.assertIsInstance(store.error, ValueError)
+
+
+class RetryPolicyTests(SimpleTestCase):
+    def failing(self, *errors):
+        calls = []
+
+        def func():
+            calls.append(1)
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return "done"
+
+        return func, calls
+
+    def test_backs_off_exponentially_up_to_max_delay(self):
+        policy = RetryPolicy(retries=5, delay=0.1, backoff=3.0, max_delay=0.5)
+        func, calls = self.failing(*[OperationalError("database is locked")] * 4)
+        with mock.patch("vocab.retry.time.sleep") as sleep, mock.patch("vocab.retry.random.uniform", return_value=1.0):
+            self.assertEqual(policy.run(func), "done")
+        self.assertEqual(len(calls), 5)
+        self.assertEqual([round(c.args[0], 6) for c in sleep.call_args_list], [0.1, 0.3, 0.5, 0.5])
+
+    def test_gives_up_after_the_last_attempt(self):
+        func, calls = self.failing(*[OperationalError("database is locked")] * 3)
+        with mock.patch("vocab.retry.time.sleep"), self.assertRaises(OperationalError):
+            RetryPolicy(retries=3).run(func)
+        self.assertEqual(len(calls), 3)
+
+    def test_only_transient_lock_errors_are_retried(self):
+        self.assertTrue(RetryPolicy.is_retryable(OperationalError("database is locked")))
+        self.assertTrue(RetryPolicy.is_retryable(OperationalError("ERROR: deadlock detected")))
+        self.assertTrue(RetryPolicy.is_retryable(OperationalError("could not serialize access due to update")))
+        self.assertFalse(RetryPolicy.is_retryable(OperationalError("no such table: vocab_vocabulary")))
+        self.assertFalse(RetryPolicy.is_retryable(IntegrityError("database is locked")))
+
+        func, calls = self.failing(OperationalError("no such table: vocab_vocabulary"))
+        with mock.patch("vocab.retry.time.sleep") as sleep, self.assertRaises(OperationalError):
+            RetryPolicy(retries=3).run(func)
+        self.assertEqual(len(calls), 1)
+        sleep.assert_not_called()
+
+
+class RetryInTransactionTests(TestCase):
+    def test_not_retried_inside_an_atomic_block(self):
+        calls = []
+
+        def func():
+            calls.append(1)
+            raise OperationalError("database is locked")
+
+        with mock.patch("vocab.retry.time.sleep"), self.assertRaises(OperationalError):
+            RetryPolicy(retries=3).run(func)
+        self.assertEqual(len(calls), 1)
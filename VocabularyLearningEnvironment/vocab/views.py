@@ -1,31 +1,47 @@
+import asyncio
+import atexit
+import io
+import json
+import os
 import random
 import time
 import unicodedata
 import re
 from datetime import timedelta
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.decorators import login_required
-from django.db import transaction, OperationalError
-from django.db.models import F
-from django.http import HttpResponseBadRequest, JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.utils import timezone
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.http import require_POST
 
 from components.teacher.items import WordItem
-from components.learners.exp_memory import ExpMemoryLearner
+from components.learners.cache import LearnerCache
 from components.teacher.planners import RandomPlanner
 
 from .forms import MemberForm, StudySessionForm
-from .models import (Member,QuizList,UserAnswer,UserMemory,Vocabulary,VocabularyList,StudySession,DailyReviewCounter,ActiveStudySession,DailyMinuteCounter,QuizHistory)
+from . import deck_io
+from .catalog import bump_catalog_version, public_deck_page
+from .deck_index import deck_indexes
+from .instrumentation import view_stats
+from .models import (Member,QuizList,UserAnswer,UserMemory,Vocabulary,VocabularyList,StudySession,DailyReviewCounter,ActiveStudySession,DailyMinuteCounter,QuizHistory,release_learned_words)
 
 planner = RandomPlanner()
-
-def _reset_quiz_flags(user, quiz_list_id: int):
-    UserMemory.objects.filter(user=user,vocabulary__quiz_list_id=quiz_list_id,is_asked_in_quiz=True).update(is_asked_in_quiz=False)
+learner_cache = LearnerCache(
+    max_users=settings.LEARNER_CACHE["MAX_USERS"],
+    flush_interval=settings.LEARNER_CACHE["FLUSH_INTERVAL"],
+    cache_alias=settings.LEARNER_CACHE["CACHE_ALIAS"],
+    background_flush=settings.LEARNER_CACHE["BACKGROUND_FLUSH"],
+)
+atexit.register(learner_cache.close)
 
 @login_required
 def session_info(request, session_id):
@@ -51,37 +67,37 @@ def user_page(request):
     username = member.username
 
     user_decks = VocabularyList.objects.filter(user=member)
-    public_decks = VocabularyList.objects.filter(is_public=True).exclude(user=member)
+    # Only the first catalog page is rendered; the rest is loaded on demand.
+    public_decks, public_next = public_deck_page(exclude_user=member)
 
     if request.method == "POST" and request.POST.get("form_type") == "create_session":
-        session_form = StudySessionForm(request.POST, user=member)
+        session_form = StudySessionForm(request.POST, user=member, public_decks=public_decks)
         if session_form.is_valid():
             session = session_form.save(commit=False)
             session.user = member
 
             if session.goal_type == "quiz":
-                available_count = (Vocabulary.objects.filter(usermemory__user=member).distinct().count())
-                if available_count < session.goal_value:
-                    session_form.add_error(
-                        "goal_value",
-                        f"Not enough words in memory. You have {available_count} words learned, "
-                        f"but requested {session.goal_value} questions."
-                    )
+                # create_quiz_list refuses on learned_word_count before it
+                # samples learned words outside live quizzes.
+                try:
+                    with transaction.atomic():
+                        quiz_list = create_quiz_list(user=member, question_count=session.goal_value)
+                        quiz_list.name = session.name or ""
+                        quiz_list.save(update_fields=["name"])
+                        session.quiz_list = quiz_list
+                        session.save()
+                except ValueError as e:
+                    session_form.add_error("goal_value", str(e))
                     messages.error(request, "Could not create quiz session.")
                     return render(request, "vocab/user_page.html", {
                         "username": username,
                         "user_decks": user_decks,
                         "public_decks": public_decks,
+                        "public_next": public_next,
                         "session_form": session_form,
                         "sessions": StudySession.objects.filter(user=member).order_by("-created_at"),
                         "quiz_sessions": StudySession.objects.filter(user=member, goal_type="quiz").order_by("-created_at"),
                     })
-                with transaction.atomic():
-                    quiz_list = create_quiz_list(user=member, question_count=session.goal_value)
-                    quiz_list.name = session.name or ""            
-                    quiz_list.save(update_fields=["name"])   
-                    session.quiz_list = quiz_list
-                    session.save()
 
                 messages.success(request, f"Quiz session created with {session.goal_value} questions.")
             else:
@@ -90,7 +106,7 @@ def user_page(request):
 
             return redirect("user_page")
     else:
-        session_form = StudySessionForm(user=member)
+        session_form = StudySessionForm(user=member, public_decks=public_decks)
 
     sessions = (StudySession.objects
                 .filter(user=member)
@@ -110,93 +126,122 @@ def user_page(request):
             "username": username,
             "user_decks": user_decks,
             "public_decks": public_decks,
+            "public_next": public_next,
             "session_form": session_form,
             "sessions": sessions,           
             "quiz_sessions": quiz_sessions,  
         },
     )
 def get_public_decks(request):
-    member = request.user
-    public_decks = VocabularyList.objects.filter(is_public=True).exclude(user=member)
+    """Keyset-paginated public deck catalog: ?after=<last deck id>&limit=N."""
+    member = request.user if request.user.is_authenticated else None
+    try:
+        after = int(request.GET.get("after", 0))
+        limit = int(request.GET["limit"]) if "limit" in request.GET else None
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "after and limit must be integers."}, status=400)
+    if limit is not None and limit < 1:
+        return JsonResponse({"status": "error", "message": "limit must be positive."}, status=400)
 
-    decks_data = [
-        {
-            "id": deck.id,
-            "list_name": deck.list_name,
-            "description": deck.description,
-            "creator": deck.user.username,
-        }
-        for deck in public_decks
-    ]
-    return JsonResponse({"decks": decks_data})
+    decks, next_cursor = public_deck_page(after, limit, exclude_user=member)
+    return JsonResponse({"decks": decks, "next_cursor": next_cursor})
 
 
 @ensure_csrf_cookie
 def home(request):
     return render(request, "vocab/home.html")
 
-def choose_random_word(user, session):
-    if session.quiz_list:
-        with transaction.atomic():
-            deck = QuizList.objects.select_for_update().get(pk=session.quiz_list.id)
-
-            vocab_qs = Vocabulary.objects.filter(
-                quiz_list=deck,
-                usermemory__user=user,
-                usermemory__is_asked_in_quiz=False
-            )
-
-            if not vocab_qs.exists():
-                return {
-                    "status": "done",
-                    "message": "Quiz complete.",
-                    "score": deck.score,
-                    "total": deck.question_count
-                }
-
-            chosen_vocab = vocab_qs.order_by("?").first()
-
-            UserMemory.objects.filter(user=user, vocabulary=chosen_vocab).update(
-                is_asked_in_quiz=True
-            )
-
-        return {
-            "status": "ok",
-            "word": chosen_vocab.source_word,
-            "translation": chosen_vocab.target_word,
-            "question_id": chosen_vocab.id
-        }
-    deck = session.vocabulary_list
-    vocab_qs = Vocabulary.objects.filter(vocabulary_list=deck)
-
-    if not vocab_qs.exists():
+def _pending_quiz_question_ids(quiz_list_id):
+    # The questions from the cursor on. Serving them doesn't move the cursor;
+    # it only advances as answers arrive (see _advance_quiz), so a card that
+    # is never answered is served again instead of being lost.
+    deck = QuizList.objects.only("question_order", "cursor").get(pk=quiz_list_id)
+    return deck.question_order[deck.cursor:]
+
+
+def _advance_quiz(deck, question_ids):
+    """Returns the cursor of the locked `deck` after the answered
+    `question_ids`, and the positions in `question_ids` that count.
+
+    Answers count in quiz order: an answer moves the cursor past its question,
+    and questions passed over on the way (e.g. deleted words) count as asked
+    without an answer. Repeated answers and answers to questions before the
+    cursor don't count.
+    """
+    position = deck.cursor
+    counted = set()
+    for i, question_id in enumerate(question_ids):
+        try:
+            position = deck.question_order.index(question_id, position) + 1
+        except ValueError:
+            continue
+        counted.add(i)
+    return position, counted
+
+
+def _card(question_id, word, translation):
+    return {"word": word, "translation": translation, "question_id": question_id}
+
+
+def choose_cards(user, session, count=1, record=True):
+    """Plans the next `count` cards of `session` in one call.
+
+    Quiz cards are the next unanswered questions of the quiz; the quiz
+    only moves on when they are answered. Deck cards are recorded in the
+    user's learner only when `record` is true; otherwise the caller has to
+    acknowledge them later (see ack_cards).
+    """
+    if session.quiz_list_id:
+        pending = _pending_quiz_question_ids(session.quiz_list_id)
+        cards = []
+        start = 0
+        while len(cards) < count and start < len(pending):
+            question_ids = pending[start:start + count - len(cards)]
+            start += len(question_ids)
+            # Words whose deck was deleted since the quiz was created are skipped.
+            vocabs = Vocabulary.objects.in_bulk(question_ids)
+            chosen = [vocabs[question_id] for question_id in question_ids if question_id in vocabs]
+            cards.extend(_card(vocab.id, vocab.source_word, vocab.target_word) for vocab in chosen)
+
+        if not cards:
+            deck = QuizList.objects.get(pk=session.quiz_list_id)
+            return {
+                "status": "done",
+                "message": "Quiz complete.",
+                "score": deck.score,
+                "total": deck.question_count
+            }
+        return {"status": "ok", "cards": cards}
+
+    item_index = deck_indexes.get(session.vocabulary_list)
+    if not item_index:
         return {"status": "error", "message": "This deck is empty."}
 
-    item_list = []
-    vocab_dict = {}
-    for vocab in vocab_qs:
-        word_item = WordItem(source=vocab.source_word, target=vocab.target_word)
-        item_list.append(word_item)
-        vocab_dict[word_item] = vocab
-
-    chosen_item = planner.choose_item(item_list, context=None, time=0)
-    chosen_vocab = vocab_dict[chosen_item]
-    question = chosen_item.get_question()
-    translation = chosen_item.get_answer()
-
-    now_seconds = int(timezone.now().timestamp())
-    learner = ExpMemoryLearner.load_memory_from_db(user, alpha=0.1, beta=0.5)
-    learner.learn(chosen_item, chosen_vocab.id, now_seconds)
-    learner.save_memory_to_db_with_retry(user)
+    chosen = []
+    for _ in range(count):
+        item = planner.choose_item(item_index, context=None, time=0)
+        chosen.append((item, item_index.vocab_id(item)))
+    if record:
+        now_seconds = int(timezone.now().timestamp())
+        learner_cache.learn_many(user, chosen, now_seconds)
 
     return {
         "status": "ok",
-        "word": question,
-        "translation": translation,
-        "question_id": chosen_vocab.id
+        "cards": [_card(vocab_id, item.get_question(), item.get_answer()) for item, vocab_id in chosen],
     }
 
 
+def choose_random_word(user, session):
+    data = choose_cards(user, session)
+    if data["status"] != "ok":
+        return data
+    return {"status": "ok", **data["cards"][0]}
+
+
+MAX_PREFETCH = 20
+CARD_RESERVATIONS_KEY = "card_reservations"
+
+
 @login_required
 def random_word_view(request):
     member = request.user
@@ -204,14 +249,72 @@ def random_word_view(request):
     if not session_id:
         return JsonResponse({"status": "error", "message": "session_id is required."})
 
+    prefetch = request.GET.get("prefetch")
+    if prefetch is not None:
+        try:
+            prefetch = int(prefetch)
+        except ValueError:
+            prefetch = 0
+        if not 1 <= prefetch <= MAX_PREFETCH:
+            return JsonResponse({"status": "error", "message": f"prefetch must be between 1 and {MAX_PREFETCH}."})
+
     session = get_object_or_404(
         StudySession.objects.select_related("vocabulary_list"),
         id=session_id,
         user=member,
     )
-     
-    data=choose_random_word(member, session)
-    return JsonResponse(data) 
+
+    if prefetch is None:
+        data=choose_random_word(member, session)
+        return JsonResponse(data) 
+
+    # Deck cards are reserved in the Django session and only recorded once
+    # the client acknowledges them; a new prefetch drops unacknowledged ones.
+    data = choose_cards(member, session, prefetch, record=False)
+    if data["status"] == "ok" and not session.quiz_list_id:
+        reservations = request.session.get(CARD_RESERVATIONS_KEY, {})
+        reservations[str(session.id)] = [card["question_id"] for card in data["cards"]]
+        request.session[CARD_RESERVATIONS_KEY] = reservations
+        data["ack_required"] = True
+    return JsonResponse(data)
+
+
+@require_POST
+@login_required
+def ack_cards(request):
+    """Records prefetched deck cards the client has shown.
+
+    Takes `session_id` and one `question_id` per shown card; ids that were
+    not reserved by random_word_view are ignored.
+    """
+    member = request.user
+    session = get_object_or_404(StudySession, id=request.POST.get("session_id"), user=member)
+    reservations = request.session.get(CARD_RESERVATIONS_KEY, {})
+    pending = reservations.get(str(session.id), [])
+
+    acked = []
+    for question_id in request.POST.getlist("question_id"):
+        try:
+            question_id = int(question_id)
+        except ValueError:
+            continue
+        if question_id in pending:
+            pending.remove(question_id)
+            acked.append(question_id)
+
+    reservations[str(session.id)] = pending
+    request.session[CARD_RESERVATIONS_KEY] = reservations
+
+    vocabs = Vocabulary.objects.in_bulk(acked)
+    items = [
+        (WordItem(source=vocabs[question_id].source_word, target=vocabs[question_id].target_word), question_id)
+        for question_id in acked
+        if question_id in vocabs
+    ]
+    if items:
+        learner_cache.learn_many(member, items, int(timezone.now().timestamp()))
+
+    return JsonResponse({"status": "ok", "recorded": len(items), "pending": len(pending)})
 
 
 def login_view(request):
@@ -233,6 +336,8 @@ def login_view(request):
 
 
 def logout_view(request):
+    if request.user.is_authenticated:
+        learner_cache.evict(request.user)
     logout(request)
     messages.success(request, "Logged out successfully.")
     return redirect("main_page")
@@ -265,33 +370,109 @@ def create_list(request, count):
             description = request.POST.get("description")
             is_public = request.POST.get("is_public")
 
-            new_deck = VocabularyList.objects.create(
-                list_name=list_name,
-                description=description,
-                user=member,
-                is_public=bool(is_public),
-            )
-
+            # Words are generated before opening the transaction so slow
+            # translation lookups don't hold the database write lock.
             word_items = planner.load_chosen_words(count, user=member)
-            for item in word_items:
-                Vocabulary.objects.create(
-                    source_word=item.source,
-                    target_word=item.target,
-                    source_language="en",
-                    target_language="de",
-                    vocabulary_list=new_deck,
+
+            with transaction.atomic():
+                new_deck = VocabularyList.objects.create(
+                    list_name=list_name,
+                    description=description,
+                    user=member,
+                    is_public=bool(is_public),
+                )
+                Vocabulary.objects.bulk_create(
+                    [
+                        Vocabulary(
+                            source_word=item.source,
+                            target_word=item.target,
+                            source_language="en",
+                            target_language="de",
+                            vocabulary_list=new_deck,
+                        )
+                        for item in word_items
+                    ]
                 )
+            if new_deck.is_public:
+                bump_catalog_version()
 
     return redirect("user_page")
 
 
+@require_POST
+@login_required
+def import_list(request):
+    """Creates a deck from an uploaded CSV, TSV, JSONL or Anki text file.
+
+    Errors come back as a message on the user page, or as a 400 JSON body to
+    callers that prefer application/json.
+    """
+    member = request.user
+
+    def refuse(message):
+        if request.get_preferred_type(["text/html", "application/json"]) == "application/json":
+            return JsonResponse({"status": "error", "message": message}, status=400)
+        messages.error(request, message)
+        return redirect("user_page")
+
+    upload = request.FILES.get("file")
+    if upload is None:
+        return refuse("Choose a file to import.")
+
+    fmt = request.POST.get("format") or deck_io.guess_format(upload.name)
+    if fmt not in deck_io.FORMATS:
+        return refuse(f"Unsupported file type; use one of {', '.join(deck_io.FORMATS)}.")
+
+    conf = settings.DECK_IMPORT
+    if conf["MAX_UPLOAD_BYTES"] and upload.size > conf["MAX_UPLOAD_BYTES"]:
+        return refuse(f"The file is larger than {conf['MAX_UPLOAD_BYTES']} bytes.")
+
+    # Large uploads are spooled to disk by Django and read line by line here.
+    lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        result = deck_io.import_deck(
+            member,
+            lines,
+            fmt,
+            name=request.POST.get("list_name") or os.path.splitext(upload.name)[0][:100],
+            description=request.POST.get("description", ""),
+            is_public=bool(request.POST.get("is_public")),
+            max_rows=conf["MAX_ROWS"],
+        )
+    except deck_io.DeckImportError as e:
+        return refuse(str(e))
+    messages.success(
+        request, f'Imported {result.imported} words into "{result.deck.list_name}" ({result.skipped} rows skipped).'
+    )
+    return redirect("user_page")
+
+
+@login_required
+def export_list(request, list_id):
+    """Streams a deck the user owns, or any public deck, as a download."""
+    deck = get_object_or_404(VocabularyList, Q(user=request.user) | Q(is_public=True), id=list_id)
+    fmt = request.GET.get("format", "csv")
+    if fmt not in deck_io.FORMATS:
+        return JsonResponse({"status": "error", "message": f"format must be one of {', '.join(deck_io.FORMATS)}."}, status=400)
+
+    content_type, extension = deck_io.EXPORT_MEDIA[fmt]
+    response = StreamingHttpResponse(deck_io.export_deck(deck, fmt), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="deck-{deck.id}.{extension}"'
+    return response
+
+
 @login_required
 def delete_list(request, list_id):
     if request.method == "POST":
         member = request.user
         deck = get_object_or_404(VocabularyList, id=list_id, user=member)
         name = deck.list_name
-        deck.delete()
+        deck_indexes.evict(deck.id)
+        with transaction.atomic():
+            release_learned_words(UserMemory.objects.filter(vocabulary_list=deck))
+            deck.delete()
+        if deck.is_public:
+            bump_catalog_version()
 
         messages.success(request, f'"{name}" deleted.')
 
@@ -313,6 +494,31 @@ def _is_correct(given: str, expected: str) -> bool:
 
 
 
+def _answer_session(user, session_id):
+    # Answers count towards a quiz only when posted with its session.
+    if not session_id:
+        return None
+    return get_object_or_404(StudySession, id=session_id, user=user)
+
+
+def _locked_quiz(session):
+    if session is None or not session.quiz_list_id:
+        return None
+    return QuizList.objects.select_for_update().get(pk=session.quiz_list_id)
+
+
+def _record_quiz_attempt(user, session, deck):
+    last = QuizHistory.objects.filter(user=user, name=session.name).order_by('-attempt').first()
+    attempt_number = (last.attempt if last else 0) + 1
+    QuizHistory.objects.create(
+        user=user,
+        score=deck.score,
+        question_count=deck.question_count,
+        attempt=attempt_number,
+        name=session.name
+    )
+
+
 @require_POST
 @login_required
 @transaction.atomic
@@ -329,8 +535,10 @@ def submit_answer(request):
     expected = question.target_word
     correct = _is_correct(given_answer, expected)
 
-    quiz = question.quiz_list
-    if not quiz:
+    session = _answer_session(user, request.POST.get("session_id") or request.GET.get("session_id"))
+    deck = _locked_quiz(session)
+    cursor, counted = _advance_quiz(deck, [question.id]) if deck else (None, ())
+    if not counted:
         user_answer = UserAnswer.objects.create(
             user=user,
             question=question,
@@ -340,8 +548,6 @@ def submit_answer(request):
         )
         return JsonResponse({"status": "ok", "saved_id": user_answer.id, "is_correct": correct})
 
-    deck = QuizList.objects.select_for_update().get(pk=quiz.pk)
-
     user_answer = UserAnswer.objects.create(
         user=user,
         question=question,
@@ -350,26 +556,14 @@ def submit_answer(request):
         is_correct=correct,
     )
 
-    update_fields = {"asked_count": F("asked_count") + 1}
+    update_fields = {"cursor": cursor, "asked_count": F("asked_count") + cursor - deck.cursor}
     if correct:
         update_fields["score"] = F("score") + 1
     QuizList.objects.filter(pk=deck.pk).update(**update_fields)
     deck.refresh_from_db(fields=["asked_count","score","question_count"])
 
-    session_id = request.POST.get("session_id") or request.GET.get("session_id")
-    session = get_object_or_404(StudySession, id=session_id, user=user)
-
     if deck.asked_count >= deck.question_count:
-        last = QuizHistory.objects.filter(user=user, name=session.name).order_by('-attempt').first()
-        attempt_number = (last.attempt if last else 0) + 1
-        QuizHistory.objects.create(
-            user=user,
-            score=deck.score,
-            question_count=deck.question_count,
-            attempt=attempt_number,
-            name=session.name
-        )
-        #_reset_quiz_flags(user, deck.id) #keeping the flags true so that choose_random_word can return true
+        _record_quiz_attempt(user, session, deck)
 
     return JsonResponse({
         "status": "ok",
@@ -381,13 +575,93 @@ def submit_answer(request):
         "done": deck.asked_count >= deck.question_count
     })
 
+MAX_ANSWER_BATCH = 200
+
+
+@require_POST
+@login_required
+@transaction.atomic
+def submit_answers(request):
+    """Grades and stores many answers in one round trip.
+
+    Expects a JSON body {"session_id": ..., "answers": [{"question_id": ...,
+    "given_answer": ...}, ...]}. Answers are bulk-created and every quiz
+    touched by the batch gets a single F() update of score and asked_count.
+    Answers to words that no longer exist are skipped and reported back.
+    Answers count towards the session's quiz if it has one, in quiz order
+    (see _advance_quiz).
+    """
+    user = request.user
+    try:
+        payload = json.loads(request.body)
+        answers = [
+            (int(a["question_id"]), str(a.get("given_answer", "")))
+            for a in payload["answers"]
+        ]
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({"status": "error", "message": "Invalid request"}, status=400)
+    if not answers or len(answers) > MAX_ANSWER_BATCH:
+        return JsonResponse(
+            {"status": "error", "message": f"Send between 1 and {MAX_ANSWER_BATCH} answers."},
+            status=400,
+        )
+
+    session = _answer_session(user, payload.get("session_id"))
+    deck = _locked_quiz(session)
+    questions = Vocabulary.objects.only("id", "target_word").in_bulk(
+        {question_id for question_id, _ in answers}
+    )
+    cursor, counted = _advance_quiz(deck, [question_id for question_id, _ in answers]) if deck else (None, ())
+
+    results, skipped, rows = [], [], []
+    score = 0
+    for i, (question_id, given_answer) in enumerate(answers):
+        question = questions.get(question_id)
+        if question is None:
+            skipped.append(question_id)
+            continue
+        correct = _is_correct(given_answer, question.target_word)
+        in_quiz = i in counted
+        rows.append(UserAnswer(
+            user=user,
+            question_id=question_id,
+            quiz_list=deck if in_quiz else None,
+            given_answer=given_answer[:100],
+            is_correct=correct,
+        ))
+        results.append({"question_id": question_id, "is_correct": correct})
+        if in_quiz:
+            score += correct
+    UserAnswer.objects.bulk_create(rows)
+
+    quizzes = []
+    if counted:
+        QuizList.objects.filter(pk=deck.pk).update(
+            cursor=cursor, asked_count=F("asked_count") + cursor - deck.cursor, score=F("score") + score
+        )
+        deck.refresh_from_db(fields=["asked_count", "score", "question_count"])
+        done = deck.asked_count >= deck.question_count
+        if done:
+            _record_quiz_attempt(user, session, deck)
+        quizzes.append({
+            "quiz_list_id": deck.pk,
+            "score": deck.score,
+            "asked_count": deck.asked_count,
+            "total": deck.question_count,
+            "done": done,
+        })
+
+    return JsonResponse({"status": "ok", "results": results, "skipped": skipped, "quizzes": quizzes})
+
+
 @login_required
 #Conveys input form to the session model
 def study_sessions(request):
     member = request.user
+    public_decks, _ = public_deck_page(exclude_user=member)
 
     if request.method == "POST":
-        form = StudySessionForm(request.POST, user=member)
+        form = StudySessionForm(request.POST, user=member, public_decks=public_decks)
         if form.is_valid():
             session = form.save(commit=False)
             session.user = member
@@ -409,7 +683,7 @@ def study_sessions(request):
             messages.success(request, "Session created.")
             return redirect("study_sessions")
     else:
-        form = StudySessionForm(user=member)
+        form = StudySessionForm(user=member, public_decks=public_decks)
 
     sessions = StudySession.objects.filter(user=member).order_by("-created_at")
     return render(request, "vocab/study_sessions.html", {"form": form, "sessions": sessions})
@@ -454,7 +728,8 @@ def reverse_privacy(request, deck_id):
 
     deck = get_object_or_404(VocabularyList, id=deck_id, user=member)
     deck.is_public = not deck.is_public
-    deck.save()
+    deck.save(update_fields=["is_public"])
+    bump_catalog_version()
     return redirect("user_page")
 
 
@@ -492,6 +767,7 @@ def start_study_session(request):
 @login_required
 @transaction.atomic
 def end_study_session(request):
+    learner_cache.flush(request.user)
     active = (
         ActiveStudySession.objects.select_for_update()
         .filter(user=request.user)
@@ -525,46 +801,74 @@ def end_study_session(request):
     return JsonResponse({"status": "ended", "minutes_studied": int(full_minutes)})
 
 
-@login_required
-def get_study_time_status(request):
-    active = ActiveStudySession.objects.filter(user=request.user).first()
+def _timer_payload(active):
     if not active:
-        return JsonResponse({"active": False})
-
+        return {"active": False}
     elapsed_sec = int((timezone.now() - active.started_at).total_seconds())
-    return JsonResponse(
-        {
-            "active": True,
-            "started_at": active.started_at.isoformat(),
-            "elapsed_seconds": elapsed_sec,
-            "elapsed_minutes": elapsed_sec // 60,
-        }
-    )
+    return {
+        "active": True,
+        "study_session_id": active.study_session_id,
+        "started_at": active.started_at.isoformat(),
+        "elapsed_seconds": elapsed_sec,
+        "elapsed_minutes": elapsed_sec // 60,
+    }
 
-@require_POST
+
+def _progress_payload(session, progress):
+    return {
+        "goal_type": session.goal_type,
+        "goal_value": session.goal_value,
+        "progress": progress,
+        "done": progress >= session.goal_value,
+        "is_running_today": session.is_running_today(),
+    }
+
+
+def _quiz_payload(deck):
+    if not deck:
+        return {"has_quiz": False}
+    return {
+        "has_quiz": True,
+        "is_complete": deck.asked_count >= deck.question_count,
+        "score": deck.score,
+        "total": deck.question_count,
+    }
+
+
+# The polling endpoints below are async so one ASGI worker can serve many
+# open tabs without a thread per request.
 @login_required
+async def get_study_time_status(request):
+    user = await request.auser()
+    active = await ActiveStudySession.objects.filter(user=user).afirst()
+    payload = _timer_payload(active)
+    payload.pop("study_session_id", None)
+    return JsonResponse(payload)
+
+
 @transaction.atomic
-def update_study_time(request):
+def _update_study_time(user):
+    # select_for_update needs a transaction, which the async ORM can't open.
     active = (
         ActiveStudySession.objects.select_for_update()
-        .filter(user=request.user)
+        .filter(user=user)
         .select_related("study_session")
         .first()
     )
     if not active:
-        return JsonResponse({"active": False})
+        return {"active": False}
 
     if active.study_session.goal_type != "minutes_per_day":
-        return JsonResponse({"active": True, "added_minutes": 0, "ignored": True})
+        return {"active": True, "added_minutes": 0, "ignored": True}
 
     elapsed_sec = int((timezone.now() - active.started_at).total_seconds())
     full_minutes = elapsed_sec // 60
     if full_minutes <= 0:
-        return JsonResponse({"active": True, "added_minutes": 0})
+        return {"active": True, "added_minutes": 0}
 
     today = timezone.localdate()
     counter, _ = DailyMinuteCounter.objects.select_for_update().get_or_create(
-        user=request.user,
+        user=user,
         study_session=active.study_session,
         date=today,
         defaults={"minutes": 0},
@@ -576,7 +880,14 @@ def update_study_time(request):
     active.started_at = active.started_at + timedelta(minutes=full_minutes)
     active.save(update_fields=["started_at"])
 
-    return JsonResponse({"active": True, "added_minutes": full_minutes})
+    return {"active": True, "added_minutes": full_minutes}
+
+
+@require_POST
+@login_required
+async def update_study_time(request):
+    user = await request.auser()
+    return JsonResponse(await sync_to_async(_update_study_time)(user))
 
 
 @require_POST
@@ -609,57 +920,59 @@ def delete_session(request, session_id):
                     minutes=F("minutes") + full_minutes
                 )
             active.delete()
-    if session.goal_type == "quiz" and session.quiz_list_id:
-        qid = session.quiz_list_id
-        _reset_quiz_flags(request.user, qid)
-        Vocabulary.objects.filter(quiz_list_id=qid).update(quiz_list=None)
-        
+    # A quiz's words become available to new quizzes again once no session
+    # refers to it; its QuizList row is kept for the answers pointing at it.
     session.delete()
     return redirect("user_page")
 
 
 # Returns today's progress for the given StudySession (reviews or minutes) and whether the daily goal has been completed. Its like a getter funct
 @login_required
-def progress_check(request, session_id):
-    session = get_object_or_404(StudySession, id=session_id, user=request.user)
+async def progress_check(request, session_id):
+    user = await request.auser()
+    session = await aget_object_or_404(StudySession, id=session_id, user=user)
     today = timezone.localdate()
 
     if session.goal_type == "reviews_per_day":
-        counter = DailyReviewCounter.objects.filter(
-            user=request.user, study_session=session, date=today
-        ).first()
+        counter = await DailyReviewCounter.objects.filter(
+            user=user, study_session=session, date=today
+        ).afirst()
         progress = counter.count if counter else 0
     else:
-        counter = DailyMinuteCounter.objects.filter(
-            user=request.user, study_session=session, date=today
-        ).first()
+        counter = await DailyMinuteCounter.objects.filter(
+            user=user, study_session=session, date=today
+        ).afirst()
         progress = counter.minutes if counter else 0
 
-    return JsonResponse(
-        {
-            "goal_type": session.goal_type,
-            "goal_value": session.goal_value,
-            "progress": progress,
-            "done": progress >= session.goal_value,
-            "is_running_today": session.is_running_today(),
-        }
-    )
+    return JsonResponse(_progress_payload(session, progress))
 
 def create_quiz_list(user, question_count):
-    user_memory_vocabs = Vocabulary.objects.filter(usermemory__user=user, usermemory__is_asked_in_quiz=False, quiz_list__isnull=True).distinct() #only the words that were never related to a quiz are added   
-    available_count = user_memory_vocabs.count()
+    learner_cache.flush(user)
+    # learned_word_count bounds what is available, so too large quizzes are
+    # refused without touching UserMemory.
+    learned = Member.objects.filter(pk=user.pk).values_list("learned_word_count", flat=True).get()
+    if learned < question_count:
+        raise ValueError(f"Not enough words in memory. You have {learned} words learned, but requested {question_count} questions.")
+
+    # Words that are part of one of the user's live quizzes are left out.
+    in_quizzes = set()
+    for question_order in QuizList.objects.filter(user=user, quiz_sessions__isnull=False).values_list("question_order", flat=True):
+        in_quizzes.update(question_order)
+    # The sample is drawn by the database (ORDER BY RANDOM() with a LIMIT
+    # keeps only question_count ids), so the learned ids never reach Python.
+    selected_ids = list(
+        UserMemory.objects.filter(user=user, vocabulary__isnull=False)
+        .exclude(vocabulary_id__in=in_quizzes)
+        .order_by("?")
+        .values_list("vocabulary_id", flat=True)[:question_count]
+    )
+    if len(selected_ids) < question_count:
+        raise ValueError(
+            f"Not enough words in memory. {len(selected_ids)} of your {learned} learned words are not in a running "
+            f"quiz, but you requested {question_count} questions."
+        )
 
-    if available_count < question_count:
-        raise ValueError(f"Not enough words in memory. You have {available_count} words learned, but requested {question_count} questions.")
-    
-    selected_vocabs = random.sample(list(user_memory_vocabs), question_count)
-    selected_ids = [v.id for v in selected_vocabs]
-    
-    with transaction.atomic():
-        quiz_list = QuizList.objects.create(user=user,question_count=question_count)
-        Vocabulary.objects.filter(id__in=selected_ids).update(quiz_list=quiz_list)
-    
-    return quiz_list
+    return QuizList.objects.create(user=user,question_count=question_count,question_order=selected_ids)
 
 def save_quiz_to_history(user, quiz_list, session):
     previous_attempts = QuizHistory.objects.filter(user=user, name=session.name).count()
@@ -686,21 +999,108 @@ def restart_quiz(request, session_id):
 
     old_quiz.asked_count = 0
     old_quiz.score = 0
-    old_quiz.save()
-
-    UserMemory.objects.filter(user=request.user, vocabulary__quiz_list=old_quiz).update(is_asked_in_quiz=False)
+    old_quiz.cursor = 0
+    random.shuffle(old_quiz.question_order)
+    old_quiz.save(update_fields=["asked_count", "score", "cursor", "question_order"])
 
     return JsonResponse({"status": "ok","message": "Quiz reset.","quiz_list_id": old_quiz.id,"question_count": old_quiz.question_count})
 
 @login_required
-def quiz_status(request, session_id):
-    session = get_object_or_404(StudySession, id=session_id, user=request.user, goal_type="quiz")
-    deck = session.quiz_list
-    if not deck:
-        return JsonResponse({"has_quiz": False})
-    return JsonResponse({
-        "has_quiz": True,
-        "is_complete": deck.asked_count >= deck.question_count,
-        "score": deck.score,
-        "total": deck.question_count,
-    })
\ No newline at end of file
+async def quiz_status(request, session_id):
+    user = await request.auser()
+    session = await aget_object_or_404(
+        StudySession.objects.select_related("quiz_list"), id=session_id, user=user, goal_type="quiz"
+    )
+    return JsonResponse(_quiz_payload(session.quiz_list))
+
+
+async def _study_snapshot(user, session_id=None):
+    # Timer, today's progress and quiz state for the user's sessions (or one
+    # session) in a constant number of queries.
+    today = timezone.localdate()
+    sessions = StudySession.objects.filter(user=user).select_related("quiz_list")
+    if session_id is not None:
+        sessions = sessions.filter(id=session_id)
+    reviews = {
+        sid: count
+        async for sid, count in DailyReviewCounter.objects.filter(user=user, date=today).values_list("study_session_id", "count")
+    }
+    minutes = {
+        sid: count
+        async for sid, count in DailyMinuteCounter.objects.filter(user=user, date=today).values_list("study_session_id", "minutes")
+    }
+    active = await ActiveStudySession.objects.filter(user=user).afirst()
+
+    snapshot = {"timer": _timer_payload(active), "sessions": {}}
+    # Seconds change on every tick; clients derive them from started_at.
+    snapshot["timer"].pop("elapsed_seconds", None)
+    async for session in sessions:
+        counters = reviews if session.goal_type == "reviews_per_day" else minutes
+        entry = _progress_payload(session, counters.get(session.id, 0))
+        if session.goal_type == "quiz":
+            entry["quiz"] = _quiz_payload(session.quiz_list)
+        snapshot["sessions"][str(session.id)] = entry
+    return snapshot
+
+
+async def _study_events(user, session_id):
+    conf = settings.STUDY_STREAM
+    started = last_sent = time.monotonic()
+    last_snapshot = None
+    yield f"retry: {conf['RETRY_MS']}\n\n"
+
+    while time.monotonic() - started < conf["MAX_DURATION"]:
+        snapshot = await _study_snapshot(user, session_id)
+        timer = snapshot["timer"]
+        if (
+            timer["active"]
+            and timer["study_session_id"] == session_id
+            and timer["elapsed_minutes"] > 0
+            and snapshot["sessions"][str(session_id)]["goal_type"] == "minutes_per_day"
+        ):
+            # An open study stream replaces the client's minute heartbeat.
+            await sync_to_async(_update_study_time)(user)
+            snapshot = await _study_snapshot(user, session_id)
+
+        now = time.monotonic()
+        if snapshot != last_snapshot:
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            last_snapshot = snapshot
+            last_sent = now
+        elif now - last_sent >= conf["KEEPALIVE"]:
+            yield ": keepalive\n\n"
+            last_sent = now
+        await asyncio.sleep(conf["POLL_INTERVAL"])
+
+
+@login_required
+async def study_stream(request):
+    """Server-Sent Events stream of timer, progress and quiz state.
+
+    Pushes a snapshot whenever it changes, for all of the user's sessions or
+    only `session_id`. The stream closes after STUDY_STREAM["MAX_DURATION"]
+    seconds and the browser's EventSource reconnects on its own.
+
+    Only served over ASGI: under WSGI the stream would pin a worker thread
+    for its whole duration, so it answers 204, which stops EventSource from
+    reconnecting, and the pages fall back to polling.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+    session_id = request.GET.get("session_id")
+    if session_id is not None:
+        session = await aget_object_or_404(StudySession, id=session_id, user=user)
+        session_id = session.id
+
+    response = StreamingHttpResponse(_study_events(user, session_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@user_passes_test(lambda u: u.is_active and u.is_superuser)
+def instrumentation_stats(request):
+    if request.method == "POST" and request.POST.get("reset"):
+        view_stats.reset()
+    return JsonResponse({"views": view_stats.snapshot()})